@@ -0,0 +1,161 @@
+import pandas as pd
+import numpy as np
+
+
+def calculate_ts_beta(stock_excess_returns, market_excess_return):
+    """Rolling correlation x volatility-ratio beta for every column of a stock excess-return panel."""
+    rolling_correlation = stock_excess_returns.rolling(window=60, min_periods=36).corr(market_excess_return)
+    stock_volatility = stock_excess_returns.rolling(window=12, min_periods=12).std()
+    market_volatility = market_excess_return.rolling(window=12, min_periods=12).std()
+
+    return rolling_correlation * stock_volatility.div(market_volatility, axis=0)
+
+
+def rolling_regression_moments(stock_excess_returns, market_excess_return, window=60, min_periods=36):
+    """Rolling OLS slope and its sampling variance for every stock, from masked rolling sums."""
+    valid = stock_excess_returns.notna().mul(market_excess_return.notna(), axis=0).astype(bool)
+    y = stock_excess_returns.where(valid)
+    x = valid.mul(market_excess_return, axis=0).where(valid)
+
+    def rolling_sum(df):
+        return df.rolling(window=window, min_periods=1).sum()
+
+    n = rolling_sum(valid.astype(float))
+    sx, sy = rolling_sum(x), rolling_sum(y)
+    var_x = rolling_sum(x ** 2) - sx ** 2 / n
+    cov_xy = rolling_sum(x * y) - sx * sy / n
+    var_y = rolling_sum(y ** 2) - sy ** 2 / n
+
+    beta = cov_xy / var_x
+    residual_variance = (var_y - beta * cov_xy) / (n - 2)
+    beta_variance = residual_variance / var_x
+
+    enough = n >= min_periods
+    return beta.where(enough), beta_variance.where(enough)
+
+
+def correlation_beta(stock_excess_returns, market_excess_return):
+    """The thesis estimator (60-month correlation x 12-month volatility ratio).
+
+    The sampling variance is taken from the 60-month OLS regression over the same window.
+    """
+    _, beta_variance = rolling_regression_moments(stock_excess_returns, market_excess_return)
+    return calculate_ts_beta(stock_excess_returns, market_excess_return), beta_variance
+
+
+def ols_beta(stock_excess_returns, market_excess_return, window=60, min_periods=36):
+    """Plain rolling OLS beta."""
+    return rolling_regression_moments(stock_excess_returns, market_excess_return, window, min_periods)
+
+
+def dimson_beta(stock_excess_returns, market_excess_return, lags=1, window=60, min_periods=36, chunk_size=2000):
+    """Dimson sum beta from rolling regressions on the current and `lags` lagged market returns.
+
+    Only lags enter, so the estimate at month t uses data up to t. The normal equations of every
+    stock and month are built from masked rolling sums and solved in one batched call per chunk
+    of stocks, which bounds memory at chunk_size x months x (lags + 2)².
+    """
+    regressors = np.column_stack([np.ones(len(market_excess_return))] +
+                                 [market_excess_return.shift(lag).to_numpy() for lag in range(lags + 1)])
+    k = regressors.shape[1]
+    regressors_valid = np.isfinite(regressors).all(axis=1)
+    regressors = np.nan_to_num(regressors)
+
+    beta_chunks, variance_chunks = [], []
+    for start in range(0, stock_excess_returns.shape[1], chunk_size):
+        chunk = stock_excess_returns.iloc[:, start:start + chunk_size]
+        valid = chunk.notna().to_numpy() & regressors_valid[:, None]
+        y = np.where(valid, chunk.to_numpy(dtype=float), 0.0)
+        w = valid.astype(float)
+
+        def rolling_sum(values):
+            return pd.DataFrame(values).rolling(window=window, min_periods=1).sum().to_numpy()
+
+        n = rolling_sum(w)
+        xtx = np.empty(y.shape + (k, k))
+        xty = np.empty(y.shape + (k,))
+        for a in range(k):
+            xty[..., a] = rolling_sum(y * regressors[:, [a]])
+            for b in range(a, k):
+                xtx[..., a, b] = xtx[..., b, a] = rolling_sum(w * (regressors[:, a] * regressors[:, b])[:, None])
+        yty = rolling_sum(y ** 2)
+
+        solvable = (n >= max(min_periods, k + 1)) & (np.abs(np.linalg.det(xtx)) > 1e-18)
+        xtx[~solvable] = np.eye(k)
+        xtx_inv = np.linalg.inv(xtx)
+        coefficients = np.einsum('...ab,...b->...a', xtx_inv, xty)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            residual_variance = (yty - np.einsum('...a,...a->...', coefficients, xty)) / (n - k)
+        slope_variance = xtx_inv[..., 1:, 1:].sum(axis=(-1, -2)) * residual_variance
+
+        beta_chunks.append(np.where(solvable, coefficients[..., 1:].sum(axis=-1), np.nan))
+        variance_chunks.append(np.where(solvable, slope_variance, np.nan))
+
+    beta = pd.DataFrame(np.hstack(beta_chunks), index=stock_excess_returns.index, columns=stock_excess_returns.columns)
+    variance = pd.DataFrame(np.hstack(variance_chunks), index=stock_excess_returns.index,
+                            columns=stock_excess_returns.columns)
+    return beta, variance
+
+
+def ewma_beta(stock_excess_returns, market_excess_return, halflife=24, min_periods=36):
+    """Exponentially weighted beta; each month is an O(1) recursive update of the weighted moments."""
+    valid = stock_excess_returns.notna().mul(market_excess_return.notna(), axis=0).astype(bool)
+    y = stock_excess_returns.where(valid)
+    x = valid.mul(market_excess_return, axis=0).where(valid)
+
+    def ewm_mean(df):
+        return df.ewm(halflife=halflife, adjust=False, ignore_na=True).mean()
+
+    mean_x, mean_y = ewm_mean(x), ewm_mean(y)
+    var_x = ewm_mean(x ** 2) - mean_x ** 2
+    cov_xy = ewm_mean(x * y) - mean_x * mean_y
+    var_y = ewm_mean(y ** 2) - mean_y ** 2
+
+    beta = cov_xy / var_x
+    # Effective number of observations of an EWMA with decay alpha is (2 - alpha) / alpha
+    alpha = 1 - np.exp(np.log(0.5) / halflife)
+    effective_n = (2 - alpha) / alpha
+    beta_variance = (var_y - beta * cov_xy) / (effective_n * var_x)
+
+    enough = valid.cumsum() >= min_periods
+    return beta.where(enough & valid), beta_variance.where(enough & valid)
+
+
+def vasicek_shrinkage(beta_df, beta_variance_df=None, shrinkage_factor=0.6):
+    """Constant-weight shrinkage toward the cross-sectional mean beta (the thesis default)."""
+    beta_xs = beta_df.mean(axis=1)
+    return beta_df.mul(shrinkage_factor).add((1 - shrinkage_factor) * beta_xs, axis=0)
+
+
+def bayesian_vasicek_shrinkage(beta_df, beta_variance_df, shrinkage_factor=None):
+    """Vasicek (1973) posterior beta: each stock is weighted by its own estimation error.
+
+    The prior is the cross-sectional mean and variance of the betas at each date, so a stock
+    with a noisy estimate is pulled harder toward the mean than a precisely estimated one.
+    """
+    prior_mean = beta_df.mean(axis=1)
+    prior_variance = beta_df.var(axis=1)
+    weight = 1 / (1 + beta_variance_df.div(prior_variance, axis=0))
+    return (beta_df * weight).add((1 - weight).mul(prior_mean, axis=0))
+
+
+BETA_ESTIMATORS = {
+    "correlation": correlation_beta,
+    "ols": ols_beta,
+    "dimson": dimson_beta,
+    "ewma": ewma_beta,
+}
+
+SHRINKAGE_METHODS = {
+    "vasicek": vasicek_shrinkage,
+    "bayesian": bayesian_vasicek_shrinkage,
+}
+
+
+def estimate_betas(stock_excess_returns, market_excess_return, estimator="correlation", shrinkage="vasicek",
+                   shrinkage_factor=0.6, **estimator_kwargs):
+    """Run one estimator from BETA_ESTIMATORS and one shrinkage method from SHRINKAGE_METHODS on a whole panel."""
+    beta_df, beta_variance_df = BETA_ESTIMATORS[estimator](stock_excess_returns, market_excess_return,
+                                                           **estimator_kwargs)
+    return SHRINKAGE_METHODS[shrinkage](beta_df, beta_variance_df, shrinkage_factor=shrinkage_factor)
@@ -1,6 +1,9 @@
 import pandas as pd
 import numpy as np
 import os
+from beta_estimators_de import calculate_ts_beta, estimate_betas
+from winsorize_de import winsorize_cross_section
+from validation_de import validate_inputs
 
 def load_and_prepare_data(rates_file, cdax_file, returns_file):
     rates_df = pd.read_csv(rates_file)
@@ -15,6 +18,13 @@ def load_and_prepare_data(rates_file, cdax_file, returns_file):
     cdax_df.set_index('Date', inplace=True)
     returns_df.set_index('Date', inplace=True)
 
+    # Returns are in percent here, the CDAX in decimals; catch a file delivered in the other unit
+    validate_inputs({
+        "returns": {"frame": returns_df, "unit": "percent_return"},
+        "cdax": {"frame": cdax_df, "unit": "decimal_return", "columns": ["Return"]},
+        "rates": {"frame": rates_df, "unit": "percent_rate", "columns": ["Price"]},
+    }, '2003-01-01', '2023-12-31')
+
     return rates_df, cdax_df, returns_df
 
 def resample_and_transform_data(rates_df, cdax_df, returns_df):
@@ -37,44 +47,51 @@ def resample_and_transform_data(rates_df, cdax_df, returns_df):
     return monthly_returns_df, monthly_cdax_df, monthly_rates_df
 
 def calculate_shrinkage_beta(monthly_returns_df, monthly_cdax_df, monthly_rates_df, shrinkage_factor=0.6):
-    beta_df = pd.DataFrame(index=monthly_returns_df.index, columns=monthly_returns_df.columns)
-
-    for stock in monthly_returns_df.columns:
-        stock_excess_return = monthly_returns_df[stock] - monthly_rates_df['Price']
+    stock_excess_returns = monthly_returns_df.sub(monthly_rates_df['Price'], axis=0)
 
-        rolling_correlation = (
-            stock_excess_return
-            .rolling(window=60, min_periods=36)
-            .corr(monthly_cdax_df['Excess Return'])
-        )
-        stock_volatility = stock_excess_return.rolling(window=12, min_periods=12).std()
-        market_volatility = monthly_cdax_df['Excess Return'].rolling(window=12, min_periods=12).std()
-
-        # Compute time-series estimated beta
-        ts_beta = rolling_correlation * (stock_volatility / market_volatility)
-        beta_df[stock] = ts_beta
+    # Compute time-series estimated beta
+    beta_df = calculate_ts_beta(stock_excess_returns, monthly_cdax_df['Excess Return'])
 
     # Compute cross-sectional mean beta
     beta_xs = beta_df.mean(axis=1)  # Mean beta at each time step
 
     # Apply Vasicek shrinkage adjustment
-    shrinkage_beta_df = beta_df.apply(lambda col: shrinkage_factor * col + (1 - shrinkage_factor) * beta_xs, axis=0)
+    shrinkage_beta_df = beta_df.mul(shrinkage_factor).add((1 - shrinkage_factor) * beta_xs, axis=0)
 
     return shrinkage_beta_df
 
+def calculate_beta(monthly_returns_df, monthly_cdax_df, monthly_rates_df, estimator='correlation',
+                   shrinkage='vasicek', shrinkage_factor=0.6, **estimator_kwargs):
+    """Any estimator/shrinkage pair from beta_estimators_de on the same excess returns as calculate_shrinkage_beta."""
+    stock_excess_returns = monthly_returns_df.sub(monthly_rates_df['Price'], axis=0)
+    return estimate_betas(stock_excess_returns, monthly_cdax_df['Excess Return'], estimator, shrinkage,
+                          shrinkage_factor, **estimator_kwargs)
+
 def save_beta_to_csv(beta_df, output_file):
     beta_df.to_csv(output_file)
 
-def main(rates_file, cdax_file, returns_file, output_file):
+def main(rates_file, cdax_file, returns_file, output_file, estimator='correlation', shrinkage='vasicek',
+         winsorize_limits=None):
     rates_df, cdax_df, returns_df = load_and_prepare_data(rates_file, cdax_file, returns_file)
     monthly_returns_df, monthly_cdax_df, monthly_rates_df = resample_and_transform_data(rates_df, cdax_df, returns_df)
-    beta_df = calculate_shrinkage_beta(monthly_returns_df, monthly_cdax_df, monthly_rates_df)
+    monthly_returns_df = winsorize_cross_section(monthly_returns_df, winsorize_limits)
+    if estimator == 'correlation' and shrinkage == 'vasicek':
+        beta_df = calculate_shrinkage_beta(monthly_returns_df, monthly_cdax_df, monthly_rates_df)
+    else:
+        beta_df = calculate_beta(monthly_returns_df, monthly_cdax_df, monthly_rates_df, estimator, shrinkage)
     save_beta_to_csv(beta_df, output_file)
 
-path = os.getcwd()
-main(
-    rates_file=f'{path}/German data/Combined_ECB_Rates_and_Germany_3-Month_Yields.csv',
-    cdax_file=f'{path}/German data/cdax_returns_06_2024.xlsx',
-    returns_file=f'{path}/German data/DE_total_return_01-2024.csv',
-    output_file=f'{path}/DEResults/de_beta_values.csv'
-)
+def default_config(path):
+    """The thesis run's inputs and settings, relative to the repository root."""
+    return dict(
+        rates_file=f'{path}/German data/Combined_ECB_Rates_and_Germany_3-Month_Yields.csv',
+        cdax_file=f'{path}/German data/cdax_returns_06_2024.xlsx',
+        returns_file=f'{path}/German data/DE_total_return_01-2024.csv',
+        output_file=f'{path}/DEResults/de_beta_values.csv',
+        estimator='correlation',  # 'correlation', 'ols', 'dimson' (thinly traded small caps) or 'ewma'
+        shrinkage='vasicek',  # 'vasicek' (constant 0.6) or 'bayesian'
+        winsorize_limits=(0.01, 0.99)  # per-month cross-sectional percentiles; None to skip
+    )
+
+if __name__ == "__main__":
+    main(**default_config(os.getcwd()))
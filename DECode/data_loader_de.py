@@ -0,0 +1,41 @@
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+
+def read_source(file, index_col, date_format=None, delimiter=','):
+    """Read one CSV/Excel source into a frame indexed by its parsed date column."""
+    if file.endswith('.xlsx'):
+        df = pd.read_excel(file)
+    else:
+        df = pd.read_csv(file, delimiter=delimiter)
+    # An unparseable date fails the source, so load_sources reports it with the other broken inputs
+    try:
+        df[index_col] = pd.to_datetime(df[index_col], format=date_format)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Error parsing dates in {file}: {e}") from e
+    return df.set_index(index_col)
+
+
+def load_sources(sources, max_workers=None, use_processes=False):
+    """Load every source of a stage concurrently.
+
+    sources maps a name to the keyword arguments of read_source, e.g.
+    {"risk_free": {"file": ..., "index_col": "DATE"}}. Threads suit the C CSV parser; processes
+    help when Excel parsing dominates. Every failing file is reported before raising, so one
+    run shows all broken inputs at once.
+    """
+    executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with executor_class(max_workers=max_workers or len(sources)) as executor:
+        futures = {name: executor.submit(read_source, **spec) for name, spec in sources.items()}
+
+    frames, errors = {}, {}
+    for name, future in futures.items():
+        try:
+            frames[name] = future.result()
+        except Exception as e:
+            errors[name] = e
+            print(f"Error loading {name} from {sources[name]['file']}: {e}")
+
+    if errors:
+        raise RuntimeError(f"Failed to load {len(errors)} of {len(sources)} sources: {', '.join(errors)}")
+    return frames
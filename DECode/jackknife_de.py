@@ -0,0 +1,129 @@
+import pandas as pd
+import numpy as np
+from results_db_de import save_results_to_db, scenario_name
+
+FACTOR_MODELS = {
+    "CAPM": ["MKT"],
+    "Three Factor": ["MKT", "SMB", "HML"],
+    "Four Factor": ["MKT", "SMB", "HML", "UMD"],
+}
+
+
+def yearly_sufficient_statistics(excess_returns_df, factors_df):
+    """Per-year sums and cross-products of [1, factors] and every portfolio's excess return.
+
+    Each portfolio uses the months in which it and all factors are observed, like the dropna
+    before the statsmodels regressions. Returns the years plus arrays of shape
+    (years, portfolios, ...) that add up to the full-sample normal equations.
+    """
+    factors_df = factors_df.reindex(excess_returns_df.index)
+    design = np.column_stack([np.ones(len(factors_df)), factors_df.to_numpy(dtype=float)])
+    returns = excess_returns_df.to_numpy(dtype=float)
+
+    valid = np.isfinite(returns) & np.isfinite(design).all(axis=1)[:, None]
+    # Months no portfolio uses would only add empty years
+    used = valid.any(axis=1)
+    valid, returns, design = valid[used], returns[used], design[used]
+    weights = valid.astype(float)
+    returns = np.where(valid, returns, 0.0)
+    design = np.nan_to_num(design)
+
+    years, year_codes = np.unique(excess_returns_df.index.year[used], return_inverse=True)
+    num_years, num_portfolios, k = len(years), returns.shape[1], design.shape[1]
+
+    ztz = np.zeros((num_years, num_portfolios, k, k))
+    zty = np.zeros((num_years, num_portfolios, k))
+    yty = np.zeros((num_years, num_portfolios))
+    np.add.at(ztz, year_codes, np.einsum('tp,ta,tb->tpab', weights, design, design))
+    np.add.at(zty, year_codes, np.einsum('tp,ta->tpa', returns, design))
+    np.add.at(yty, year_codes, returns ** 2)
+    return years, ztz, zty, yty
+
+
+def scenario_statistics(ztz, zty, yty, factor_columns, models=FACTOR_MODELS):
+    """Mean, Sharpe and factor-model alphas for a stack of scenarios from their normal equations alone."""
+    n = ztz[..., 0, 0]
+    total = zty[..., 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / n
+        centered = yty - total * mean
+        volatility = np.sqrt(centered / (n - 1))
+        statistics = {
+            "Excess Return": mean,
+            "Excess Return t-stat": mean / (volatility / np.sqrt(n)),
+        }
+
+        for model, factors in models.items():
+            if not set(factors) <= set(factor_columns):
+                continue
+            columns = [0] + [1 + factor_columns.index(factor) for factor in factors]
+            xtx = ztz[..., columns, :][..., :, columns]
+            xty = zty[..., columns]
+            solvable = n > len(columns)
+            xtx_inv = np.linalg.inv(np.where(solvable[..., None, None], xtx, np.eye(len(columns))))
+            coefficients = np.einsum('...ab,...b->...a', xtx_inv, xty)
+            sse = yty - np.einsum('...a,...a->...', coefficients, xty)
+            residual_variance = sse / (n - len(columns))
+
+            alpha = np.where(solvable, coefficients[..., 0], np.nan)
+            statistics[f"{model} Alpha"] = alpha
+            statistics[f"{model} Alpha t-stat"] = alpha / np.sqrt(residual_variance * xtx_inv[..., 0, 0])
+            statistics[f"{model} R²"] = np.where(solvable, 1 - sse / centered, np.nan)
+
+        statistics["Volatility"] = volatility
+        statistics["Sharpe Ratio"] = mean / volatility * np.sqrt(12)
+    return statistics
+
+
+def leave_one_year_out(excess_returns_df, factors_df, models=FACTOR_MODELS):
+    """Full-sample and every leave-one-year-out statistic from a single pass over the data.
+
+    The normal equations of the sample without year y are the full-sample sums minus year y's
+    sums, so all scenarios are solved as one batched system instead of rerunning the regressions.
+    """
+    years, ztz, zty, yty = yearly_sufficient_statistics(excess_returns_df, factors_df)
+
+    # Scenario 0 is the full sample, scenario i drops years[i - 1]
+    ztz = np.concatenate([ztz.sum(axis=0, keepdims=True), ztz.sum(axis=0) - ztz])
+    zty = np.concatenate([zty.sum(axis=0, keepdims=True), zty.sum(axis=0) - zty])
+    yty = np.concatenate([yty.sum(axis=0, keepdims=True), yty.sum(axis=0) - yty])
+    statistics = scenario_statistics(ztz, zty, yty, list(factors_df.columns), models)
+
+    scenarios = ["full"] + [scenario_name([year]) for year in years]
+    index = pd.MultiIndex.from_product([scenarios, excess_returns_df.columns], names=["Scenario", "Portfolio"])
+    table = pd.DataFrame({name: values.ravel() for name, values in statistics.items()}, index=index)
+    table.insert(0, "Excluded Year", np.repeat(np.r_[np.nan, years], len(excess_returns_df.columns)))
+    return table.reset_index()
+
+
+def jackknife_summary(table):
+    """Per portfolio and statistic: full-sample value, range over exclusions, most influential year and jackknife SE."""
+    excluded = table[table["Scenario"] != "full"].drop(columns="Scenario")
+    full = table[table["Scenario"] == "full"].drop(columns=["Scenario", "Excluded Year"]).set_index("Portfolio")
+    metrics = list(full.columns)
+
+    long_df = excluded.melt(id_vars=["Excluded Year", "Portfolio"], value_vars=metrics, var_name="Statistic")
+    long_df["Full Sample"] = full.stack().reindex(pd.MultiIndex.from_frame(long_df[["Portfolio", "Statistic"]])).values
+    long_df["Shift"] = (long_df["value"] - long_df["Full Sample"]).abs().fillna(-1)
+    grouped = long_df.groupby(["Portfolio", "Statistic"], sort=False)
+
+    num_years = grouped["value"].transform("count")
+    deviation = long_df["value"] - grouped["value"].transform("mean")
+    long_df["Squared Deviation"] = deviation ** 2 * (num_years - 1) / num_years
+
+    summary = grouped.agg(**{
+        "Full Sample": ("Full Sample", "first"),
+        "Min": ("value", "min"),
+        "Max": ("value", "max"),
+        "Jackknife SE": ("Squared Deviation", "sum"),
+    })
+    summary["Jackknife SE"] = np.sqrt(summary["Jackknife SE"])
+    summary["Most Influential Year"] = long_df.loc[grouped["Shift"].idxmax(), "Excluded Year"].to_numpy().astype(int)
+    return summary.reset_index()
+
+
+def save_jackknife_to_db(db_file, table, proposition, params=None):
+    """Store every scenario of a leave-one-year-out table under its own scenario key."""
+    for scenario, scenario_df in table.groupby("Scenario", sort=False):
+        save_results_to_db(db_file, scenario_df.drop(columns=["Scenario", "Excluded Year"]), proposition, scenario,
+                           "jackknife_table", params, portfolio_col="Portfolio")
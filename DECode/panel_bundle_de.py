@@ -0,0 +1,69 @@
+import pandas as pd
+import numpy as np
+from results_db_de import scenario_name
+
+
+def month_end(df, how='last'):
+    """Collapse any source frequency to one row per month, stamped at the month end."""
+    df = df.to_frame() if isinstance(df, pd.Series) else df
+    df = df[df.index.notna()].sort_index()
+    return df.groupby(df.index + pd.offsets.MonthEnd(0)).agg(how)
+
+
+def build_panel_bundle(frames, start_date=None, end_date=None, how=None, exclusions=()):
+    """Align every input onto one integer-indexed monthly calendar, once.
+
+    frames maps a name to a date-indexed frame (wide panels, rates, market, factors); how
+    optionally maps a name to its monthly aggregation ('last' by default). Each frame is
+    collapsed to month ends and reindexed onto the calendar a single time and kept as a
+    float array, so row i of every array is the same month. Scenario masks are boolean
+    vectors over the calendar: 'full', every single-year exclusion and any extra year lists
+    in exclusions, keyed like results_db scenario names.
+    """
+    how = how or {}
+    monthly = {name: month_end(df, how.get(name, 'last')) for name, df in frames.items()}
+
+    start = pd.Timestamp(start_date) if start_date else min(df.index.min() for df in monthly.values())
+    end = pd.Timestamp(end_date) if end_date else max(df.index.max() for df in monthly.values())
+    dates = pd.date_range(start + pd.offsets.MonthEnd(0), end, freq="ME", name="Date")
+
+    arrays, columns = {}, {}
+    for name, df in monthly.items():
+        df = df.reindex(dates)
+        non_numeric = df.columns[[not pd.api.types.is_numeric_dtype(dtype) for dtype in df.dtypes]]
+        if len(non_numeric):
+            df[non_numeric] = df[non_numeric].apply(pd.to_numeric, errors='coerce')
+        arrays[name] = df.to_numpy(dtype=float)
+        columns[name] = df.columns
+
+    years = dates.year.to_numpy()
+    bundle = {"dates": dates, "years": years, "arrays": arrays, "columns": columns,
+              "masks": {"full": np.ones(len(dates), dtype=bool)}}
+    for year in np.unique(years):
+        bundle["masks"][scenario_name([year])] = years != year
+    for years_to_remove in exclusions:
+        scenario_mask(bundle, years_to_remove)
+    return bundle
+
+
+def scenario_mask(bundle, years_to_remove=()):
+    """Boolean calendar mask that drops the given years; computed once per scenario and cached."""
+    scenario = scenario_name(years_to_remove)
+    if scenario not in bundle["masks"]:
+        drop = [int(year) for year in years_to_remove if str(year)]
+        bundle["masks"][scenario] = ~np.isin(bundle["years"], drop)
+    return bundle["masks"][scenario]
+
+
+def bundle_array(bundle, name, years_to_remove=(), columns=None):
+    """Rows of one aligned array for a scenario, optionally restricted to some columns."""
+    values = bundle["arrays"][name][scenario_mask(bundle, years_to_remove)]
+    if columns is not None:
+        values = values[:, bundle["columns"][name].get_indexer(columns)]
+    return values
+
+
+def bundle_frame(bundle, name, years_to_remove=()):
+    """DataFrame view of one aligned array for stages that still work in pandas."""
+    mask = scenario_mask(bundle, years_to_remove)
+    return pd.DataFrame(bundle["arrays"][name][mask], index=bundle["dates"][mask], columns=bundle["columns"][name])
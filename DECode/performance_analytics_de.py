@@ -0,0 +1,73 @@
+import os
+import pandas as pd
+import numpy as np
+
+
+def underwater_duration(drawdown):
+    """Months since the last high-water mark, for every column at once."""
+    values = drawdown.to_numpy()
+    months = np.arange(len(values))[:, None]
+    last_peak = np.maximum.accumulate(np.where(values < 0, 0, months), axis=0)
+    return pd.DataFrame(months - last_peak, index=drawdown.index, columns=drawdown.columns)
+
+
+def compute_performance_panel(excess_returns_df, window=36):
+    """Rolling Sharpe, volatility and skew plus drawdown statistics of every column in one pass.
+
+    Returns a long (Date, Portfolio) table with one column per statistic.
+    """
+    rolling = excess_returns_df.rolling(window=window, min_periods=window)
+    rolling_mean, rolling_volatility = rolling.mean(), rolling.std()
+
+    wealth = (1 + excess_returns_df.fillna(0)).cumprod()
+    drawdown = wealth / wealth.cummax() - 1
+
+    statistics = {
+        "Rolling Sharpe Ratio": rolling_mean / rolling_volatility * np.sqrt(12),
+        "Rolling Volatility": rolling_volatility * np.sqrt(12),
+        "Rolling Skew": rolling.skew(),
+        "Drawdown": drawdown,
+        "Max Drawdown": drawdown.cummin(),
+        "Underwater Months": underwater_duration(drawdown),
+    }
+    index = pd.MultiIndex.from_product([excess_returns_df.index, excess_returns_df.columns],
+                                       names=["Date", "Portfolio"])
+    panel = pd.DataFrame({name: df.to_numpy().ravel() for name, df in statistics.items()}, index=index)
+    return panel.reset_index()
+
+
+def load_excess_returns(path):
+    """Quintile and BAB excess returns plus the quintile-1-minus-quintile-5 spread."""
+    returns_df = pd.read_csv(f"{path}/DEResults/Prop1/portfolio_returns.csv", index_col='Date',
+                             parse_dates=True).resample('ME').last()
+    bab_factor_df = pd.read_csv(f"{path}/DEResults/bab_factor_de.csv", index_col='Date',
+                                parse_dates=True).resample('ME').last()
+    rf_rates_df = pd.read_csv(f"{path}/German data/Combined_ECB_Rates_and_Germany_3-Month_Yields.csv",
+                              index_col='Date', parse_dates=True).resample('ME').last()
+    risk_free = rf_rates_df["Price"] / 100 / 12
+
+    returns_df.columns = [str(col) for col in returns_df.columns]
+    excess_returns_df = returns_df.sub(risk_free, axis=0)
+
+    # The beta spread is taken as already an excess return. BAB follows the prop2 regression
+    # scripts and the query service, which treat the factor as a raw return and subtract rf
+    excess_returns_df[f"{returns_df.columns[0]}-{returns_df.columns[-1]}"] = (
+        returns_df.iloc[:, 0] - returns_df.iloc[:, -1])
+    excess_returns_df["BAB"] = bab_factor_df["BAB Factor"].sub(risk_free).reindex(excess_returns_df.index)
+    return excess_returns_df
+
+
+def main():
+    path = os.getcwd()
+    OUTPUT_FILE = f"{path}/DEResults/performance_panel_de.csv"
+    window = 36
+
+    excess_returns_df = load_excess_returns(path)
+    panel_df = compute_performance_panel(excess_returns_df, window)
+
+    print(panel_df.groupby("Portfolio").last().to_string())
+    panel_df.to_csv(OUTPUT_FILE, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import os
+import sys
+import argparse
+import importlib
+
+# Stage name -> module; modules are imported only when their stage runs, so statsmodels and
+# matplotlib are never loaded for stages that do not regress or plot
+STAGES = {
+    "betas": "betas_de",
+    "beta_forecast": "beta_forecast_de",
+    "prop1": "prop1_de",
+    "prop1_regression": "prop1_de_regression",
+    "prop2": "prop2_de",
+    "prop2_regression": "prop2_de_regression",
+    "prop3": "prop3_de",
+    "funding_regimes": "funding_regimes_de",
+    "fama_macbeth": "fama_macbeth_de",
+    "low_risk": "low_risk_portfolios_de",
+    "performance": "performance_analytics_de",
+    "simulation": "simulation_de",
+}
+
+PIPELINE = ["betas", "prop1", "prop1_regression", "prop2", "prop2_regression", "prop3"]
+
+
+def run_stage(stage, root):
+    """Run one stage's main() against the repository at root."""
+    # The scripts resolve their inputs from the working directory
+    os.chdir(root)
+    module = importlib.import_module(STAGES[stage])
+    if hasattr(module, "default_config"):
+        module.main(**module.default_config(root))
+    else:
+        module.main()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run stages of the German BAB pipeline")
+    parser.add_argument("stages", nargs="+", choices=list(STAGES) + ["all"],
+                        help="stages to run in order; 'all' runs " + " -> ".join(PIPELINE))
+    parser.add_argument("--root", default=os.getcwd(), help="repository root holding 'German data' and 'DEResults'")
+    parser.add_argument("--no-plots", action="store_true", help="render figures off-screen instead of showing them")
+    args = parser.parse_args(argv)
+
+    if args.no_plots:
+        os.environ["MPLBACKEND"] = "Agg"
+    stages = [stage for name in args.stages for stage in (PIPELINE if name == "all" else [name])]
+    root = os.path.abspath(args.root)
+    for stage in stages:
+        print(f"== {stage} ==")
+        run_stage(stage, root)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
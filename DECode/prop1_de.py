@@ -1,8 +1,12 @@
 import os
 import pandas as pd
 import numpy as np
-import statsmodels.api as sm
-import matplotlib.pyplot as plt
+from results_db_de import save_results_to_db, scenario_name
+from portfolio_sorts_de import assign_sort_buckets, aggregate_buckets
+from data_loader_de import load_sources
+from winsorize_de import winsorize_cross_section
+from panel_bundle_de import build_panel_bundle, bundle_frame
+from membership_store_de import membership_matrix, save_membership
 
 
 def load_data(file, delimiter=',', index_col='DATE'):
@@ -10,33 +14,28 @@ def load_data(file, delimiter=',', index_col='DATE'):
 
 
 def load_and_process_data(beta_file, returns_file, rf_file, cdax_file, ff_file, start_date, end_date, years_to_remove):
-    beta_values_df = load_data(beta_file, index_col='Date')
-    returns_df = load_data(returns_file, delimiter=';', index_col='Date')
-    rf_rates_df = load_data(rf_file, index_col='Date')
-    cdax_returns_df = pd.read_excel(cdax_file, index_col='Date', parse_dates=True)
-    fama_french_df = load_data(ff_file)
-
-    rf_rates_df = rf_rates_df / 100 / 12
-
-    beta_values_df = beta_values_df.resample('ME').last()
-    returns_df = returns_df.resample('ME').last()
-    rf_rates_df = rf_rates_df.resample('ME').last()
-    cdax_returns_df = cdax_returns_df.resample('ME').last()
-    fama_french_df = fama_french_df.resample('ME').last()
-
-    years_to_remove = [int(year) for year in years_to_remove if year]
-
-    beta_values_df = beta_values_df.loc[start_date:end_date]
-    returns_df = returns_df.loc[start_date:end_date]
-    rf_rates_df = rf_rates_df.loc[start_date:end_date]
-    cdax_returns_df = cdax_returns_df.loc[start_date:end_date]
-    fama_french_df = fama_french_df.loc[start_date:end_date]
-
-    beta_values_df = beta_values_df[~beta_values_df.index.year.isin(years_to_remove)]
-    returns_df = returns_df[~returns_df.index.year.isin(years_to_remove)]
-    rf_rates_df = rf_rates_df[~rf_rates_df.index.year.isin(years_to_remove)]
-    cdax_returns_df = cdax_returns_df[~cdax_returns_df.index.year.isin(years_to_remove)]
-    fama_french_df = fama_french_df[~fama_french_df.index.year.isin(years_to_remove)]
+    frames = load_sources({
+        "beta_values": {"file": beta_file, "index_col": "Date"},
+        "returns": {"file": returns_file, "index_col": "Date", "delimiter": ';'},
+        "rf_rates": {"file": rf_file, "index_col": "Date"},
+        "cdax_returns": {"file": cdax_file, "index_col": "Date"},
+        "fama_french": {"file": ff_file, "index_col": "DATE"},
+    })
+    beta_values_df, returns_df, cdax_returns_df = frames["beta_values"], frames["returns"], frames["cdax_returns"]
+    fama_french_df = frames["fama_french"]
+
+    rf_rates_df = frames["rf_rates"] / 100 / 12
+
+    bundle = build_panel_bundle({
+        "beta_values": beta_values_df, "returns": returns_df, "rf_rates": rf_rates_df,
+        "cdax_returns": cdax_returns_df, "fama_french": fama_french_df,
+    }, start_date, end_date)
+
+    beta_values_df = bundle_frame(bundle, "beta_values", years_to_remove)
+    returns_df = bundle_frame(bundle, "returns", years_to_remove)
+    rf_rates_df = bundle_frame(bundle, "rf_rates", years_to_remove)
+    cdax_returns_df = bundle_frame(bundle, "cdax_returns", years_to_remove)
+    fama_french_df = bundle_frame(bundle, "fama_french", years_to_remove)
 
     return beta_values_df, returns_df, rf_rates_df, cdax_returns_df, fama_french_df
 
@@ -63,6 +62,16 @@ def create_beta_sorted_portfolios(beta_df, num_portfolios):
     return portfolios, portfolio_betas_df
 
 
+def create_double_sorted_portfolios(size_df, beta_df, returns_df, num_size=3, num_beta=5, conditional=True):
+    # Size x beta sort per date; portfolio k + 1 is size bucket k // num_beta, beta bucket k % num_beta
+    bucket_df = assign_sort_buckets([size_df, beta_df], [num_size, num_beta], conditional)
+    portfolio_returns_df = aggregate_buckets(bucket_df, returns_df, num_size * num_beta)
+    portfolio_betas_df = aggregate_buckets(bucket_df, beta_df, num_size * num_beta)
+    portfolio_returns_df.columns = portfolio_betas_df.columns = range(1, num_size * num_beta + 1)
+    portfolio_betas_df.index.name = 'Date'
+    return portfolio_returns_df, portfolio_betas_df
+
+
 def calculate_portfolio_returns(returns_df, portfolios):
     portfolio_returns = {}
     for i, portfolio in portfolios.items():
@@ -93,10 +102,13 @@ def compute_sharpe_ratios(portfolio_returns_df, rf_rates_df):
     return sharpe_ratios
 
 
-def plot_sharpe_ratios(sharpe_ratios):
+def plot_sharpe_ratios(sharpe_ratios, sort_mode='beta'):
+    import matplotlib.pyplot as plt
+    # Size x beta portfolios are numbered size bucket first, beta bucket second
+    sort = "Size x Beta" if sort_mode == 'size_beta' else "Beta-Sorted"
     plt.figure(figsize=(10, 6))
-    sharpe_ratios.plot(kind='bar', title='Annualized Sharpe Ratios of 5 Beta-Sorted Portfolios (Germany)')
-    plt.xlabel('Portfolio')
+    sharpe_ratios.plot(kind='bar', title=f'Annualized Sharpe Ratios of {len(sharpe_ratios)} {sort} Portfolios (Germany)')
+    plt.xlabel('Portfolio (size, then beta)' if sort_mode == 'size_beta' else 'Portfolio')
     plt.ylabel('Sharpe Ratio')
     plt.xticks(rotation=0)
     plt.grid(axis='y', linestyle='--', alpha=0.7)
@@ -111,22 +123,42 @@ def main():
     RISK_FREE_FILE = f"{path}/German data/Combined_ECB_Rates_and_Germany_3-Month_Yields.csv"
     CDAX_RETURNS_FILE = f"{path}/German data/cdax_returns_06_2024.xlsx"
     FAMA_FRENCH_FILE = f"{path}/German data/FF_DEU_Values.csv"
+    # Wide Date x ticker market-cap panel (';'-delimited like the returns file); set it to run the size x beta sort
+    SIZE_FILE = None
+    RESULTS_DB = f"{path}/results.sqlite"
 
     start_date, end_date = '2003-01-01', '2023-12-31'
     years_to_remove = ['']
+    winsorize_limits = (0.01, 0.99)  # per-month cross-sectional percentiles; None to skip
 
     beta_values_df, returns_df, rf_rates_df, cdax_returns_df, fama_french_df = load_and_process_data(
         BETA_FILE, RETURNS_FILE, RISK_FREE_FILE, CDAX_RETURNS_FILE, FAMA_FRENCH_FILE,
         start_date, end_date, years_to_remove)
-
-    portfolios, portfolio_betas_df = create_beta_sorted_portfolios(beta_values_df, num_portfolios=5)
-    portfolio_returns_df = calculate_portfolio_returns(returns_df, portfolios)
+    returns_df = winsorize_cross_section(returns_df, winsorize_limits)
+    beta_values_df = winsorize_cross_section(beta_values_df, winsorize_limits)
+
+    if SIZE_FILE:
+        size_df = load_data(SIZE_FILE, delimiter=';', index_col='Date').resample('ME').last()
+        portfolio_returns_df, portfolio_betas_df = create_double_sorted_portfolios(
+            size_df.reindex(beta_values_df.index), beta_values_df, returns_df)
+    else:
+        portfolios, portfolio_betas_df = create_beta_sorted_portfolios(beta_values_df, num_portfolios=5)
+        portfolio_returns_df = calculate_portfolio_returns(returns_df, portfolios)
+        membership = membership_matrix(portfolios, beta_values_df.index, beta_values_df.columns)
+        save_membership(f"{path}/DEResults/membership_store", membership, beta_values_df.index, beta_values_df.columns)
     sharpe_ratios = compute_sharpe_ratios(portfolio_returns_df, rf_rates_df)
 
     portfolio_betas_df.to_csv(f"{path}/DEResults/portfolio_betas_2020.csv")
     portfolio_returns_df.to_csv(f"{path}/DEResults/portfolio_returns_2020.csv")
-
-    plot_sharpe_ratios(sharpe_ratios)
+    # Copies of the latest run where prop1_de_regression and the analytics read them
+    os.makedirs(f"{path}/DEResults/Prop1", exist_ok=True)
+    portfolio_betas_df.to_csv(f"{path}/DEResults/Prop1/portfolio_betas.csv")
+    portfolio_returns_df.to_csv(f"{path}/DEResults/Prop1/portfolio_returns.csv")
+    params = {"start_date": start_date, "end_date": end_date, "num_portfolios": 5, "size_beta_sort": bool(SIZE_FILE)}
+    save_results_to_db(RESULTS_DB, portfolio_betas_df, 1, scenario_name(years_to_remove), "portfolio_betas", params)
+    save_results_to_db(RESULTS_DB, portfolio_returns_df, 1, scenario_name(years_to_remove), "portfolio_returns", params)
+
+    plot_sharpe_ratios(sharpe_ratios, 'size_beta' if SIZE_FILE else 'beta')
     print(sharpe_ratios)
 
 
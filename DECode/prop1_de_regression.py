@@ -1,47 +1,39 @@
 import os
 import pandas as pd
 import numpy as np
-import statsmodels.api as sm
-import matplotlib.pyplot as plt
-
-# Define file paths
-path = os.getcwd()
-
-FILES = {
-    "returns": f"{path}/German data/DE_total_return_01-2024.csv",
-    "risk_free": f"{path}/German data/Combined_ECB_Rates_and_Germany_3-Month_Yields.csv",
-    "cdax": f"{path}/German data/cdax_returns_06_2024.xlsx",
-    "fama_french": f"{path}/German data/FF_DEU_Values.csv",
-    "portfolios": f"{path}/DEResults/Prop1/portfolio_returns.csv",
-    "betas": f"{path}/DEResults/Prop1/portfolio_betas.csv"
-}
-
-
-# Load CSV and Excel files
-def load_data(file, delimiter=',', index_col='DATE'):
-    return pd.read_csv(file, delimiter=delimiter, index_col=index_col, parse_dates=True)
-
-
-def load_excel(file, index_col='Date'):
-    return pd.read_excel(file, index_col=index_col, parse_dates=True)
+from results_db_de import save_results_to_db, scenario_name
+from data_loader_de import load_sources
+from panel_bundle_de import build_panel_bundle, bundle_frame, scenario_mask
+from jackknife_de import leave_one_year_out, jackknife_summary, save_jackknife_to_db
+from grs_test_de import grs_test, save_grs_to_db
+
+# Define file paths, relative to the repository root
+def data_files(path):
+    return {
+        "returns": f"{path}/German data/DE_total_return_01-2024.csv",
+        "risk_free": f"{path}/German data/Combined_ECB_Rates_and_Germany_3-Month_Yields.csv",
+        "cdax": f"{path}/German data/cdax_returns_06_2024.xlsx",
+        "fama_french": f"{path}/German data/FF_DEU_Values.csv",
+        "portfolios": f"{path}/DEResults/Prop1/portfolio_returns.csv",
+        "betas": f"{path}/DEResults/Prop1/portfolio_betas.csv",
+        "results_db": f"{path}/results.sqlite"
+    }
 
 
 # Load datasets
-def load_all_data():
-    returns_df = load_data(FILES["returns"], delimiter=';', index_col='Date')
-    rf_rates_df = load_data(FILES["risk_free"], index_col='Date') / 100 / 12
-    cdax_returns_df = load_excel(FILES["cdax"], index_col="Date")
-    fama_french_df = load_data(FILES["fama_french"])
-    portfolios_df = load_data(FILES["portfolios"], index_col='Date')
-    betas_df = load_data(FILES["betas"], index_col='Date')
-
-    return returns_df, rf_rates_df, cdax_returns_df, fama_french_df, portfolios_df, betas_df
+def load_all_data(files):
+    frames = load_sources({
+        "returns": {"file": files["returns"], "index_col": "Date", "delimiter": ';'},
+        "risk_free": {"file": files["risk_free"], "index_col": "Date"},
+        "cdax": {"file": files["cdax"], "index_col": "Date"},
+        "fama_french": {"file": files["fama_french"], "index_col": "DATE"},
+        "portfolios": {"file": files["portfolios"], "index_col": "Date"},
+        "betas": {"file": files["betas"], "index_col": "Date"},
+    })
+    rf_rates_df = frames["risk_free"] / 100 / 12
 
-
-# Resample data to end-of-month frequency and remove specific years
-def resample_monthly(years_to_remove, *dfs):
-    resampled_dfs = [df.resample('M').last() for df in dfs]
-    return [df[~df.index.year.isin(years_to_remove)] for df in resampled_dfs]
+    return (frames["returns"], rf_rates_df, frames["cdax"], frames["fama_french"], frames["portfolios"],
+            frames["betas"])
 
 
 # Compute excess returns
@@ -51,6 +43,7 @@ def compute_excess_return(portfolio_returns, risk_free_rates):
 
 # Run regression model
 def run_regression_model(dependent_var, independent_vars, data):
+    import statsmodels.api as sm
     X = sm.add_constant(data[independent_vars])
     y = data[dependent_var]
     model = sm.OLS(y, X).fit()
@@ -104,22 +97,79 @@ def analyze_portfolios(portfolios_df, rf_rates_df, cdax_returns_df, fama_french_
     return pd.DataFrame(results)
 
 
+# Market excess return plus whichever Fama-French/Carhart factors are available
+def build_factors(rf_rates_df, cdax_returns_df, fama_french_df):
+    factors_df = pd.DataFrame({"MKT": compute_excess_return(cdax_returns_df["Return"], rf_rates_df)})
+    for factor in ["SMB", "HML", "UMD"]:
+        if factor in fama_french_df.columns:
+            factors_df[factor] = fama_french_df[factor]
+    return factors_df
+
+
+# Joint GRS test of all portfolio alphas for every factor model and exclusion scenario of the bundle
+def run_grs_test(bundle, output_file, db_file):
+    rf_rates_df = bundle_frame(bundle, "rf_rates")
+    excess_returns_df = bundle_frame(bundle, "portfolios").apply(compute_excess_return, risk_free_rates=rf_rates_df)
+    factors_df = build_factors(rf_rates_df, bundle_frame(bundle, "cdax_returns"), bundle_frame(bundle, "fama_french"))
+
+    grs_df = grs_test(excess_returns_df.to_numpy(dtype=float), factors_df.to_numpy(dtype=float), bundle["masks"],
+                      list(factors_df.columns))
+    print(grs_df[grs_df["Scenario"] == "full"].to_string(index=False))
+    grs_df.to_csv(output_file, index=False)
+    save_grs_to_db(db_file, grs_df, 1)
+
+
+# Every leave-one-year-out version of the regression table from one pass over the data
+def run_jackknife(portfolios_df, rf_rates_df, cdax_returns_df, fama_french_df, output_prefix, db_file):
+    excess_returns_df = portfolios_df.apply(compute_excess_return, risk_free_rates=rf_rates_df)
+    factors_df = build_factors(rf_rates_df, cdax_returns_df, fama_french_df)
+
+    jackknife_df = leave_one_year_out(excess_returns_df, factors_df)
+    summary_df = jackknife_summary(jackknife_df)
+    print(summary_df.to_string(index=False))
+
+    jackknife_df.to_csv(f'{output_prefix}_jackknife.csv', index=False)
+    summary_df.to_csv(f'{output_prefix}_jackknife_summary.csv', index=False)
+    save_jackknife_to_db(db_file, jackknife_df, 1)
+
+
 # Save and print results
-def save_and_print_results(df, output_path):
+def save_and_print_results(df, output_path, db_file=None, scenario="full"):
     df.to_csv(output_path, index=False)
+    if db_file:
+        save_results_to_db(db_file, df, 1, scenario, "regression_table", portfolio_col="Portfolio")
     print(df.to_string(index=False))
 
 
 # Main execution
 def main():
-    returns_df, rf_rates_df, cdax_returns_df, fama_french_df, portfolios_df, betas_df = load_all_data()
-    years_to_remove = [2020]
-    returns_df, rf_rates_df, cdax_returns_df, fama_french_df, portfolios_df, betas_df = resample_monthly(
-        years_to_remove, returns_df, rf_rates_df, cdax_returns_df, fama_french_df, portfolios_df, betas_df
-    )
-
-    results_df = analyze_portfolios(portfolios_df, rf_rates_df, cdax_returns_df, fama_french_df, betas_df)
-    save_and_print_results(results_df, f'{path}/DEResults/Prop1/regression_table_{years_to_remove[0]}.csv')
+    path = os.getcwd()
+    files = data_files(path)
+    returns_df, rf_rates_df, cdax_returns_df, fama_french_df, portfolios_df, betas_df = load_all_data(files)
+    jackknife = False  # drop every year in turn instead of the hand-picked one
+    years_to_remove = [] if jackknife else [2020]
+    # One month-end calendar spanning the portfolios, sliced per scenario by its year mask
+    portfolio_dates = portfolios_df.index.dropna()
+    bundle = build_panel_bundle({
+        "returns": returns_df, "rf_rates": rf_rates_df, "cdax_returns": cdax_returns_df,
+        "fama_french": fama_french_df, "portfolios": portfolios_df, "betas": betas_df,
+    }, portfolio_dates.min(), portfolio_dates.max())
+    returns_df, rf_rates_df, cdax_returns_df, fama_french_df, portfolios_df, betas_df = [
+        bundle_frame(bundle, name, years_to_remove)
+        for name in ["returns", "rf_rates", "cdax_returns", "fama_french", "portfolios", "betas"]
+    ]
+
+    if jackknife:
+        run_jackknife(portfolios_df, rf_rates_df, cdax_returns_df, fama_french_df,
+                      f'{path}/DEResults/Prop1/regression_table', files["results_db"])
+    else:
+        results_df = analyze_portfolios(portfolios_df, rf_rates_df, cdax_returns_df, fama_french_df, betas_df)
+        save_and_print_results(results_df, f'{path}/DEResults/Prop1/regression_table_{years_to_remove[0]}.csv',
+                               files["results_db"], scenario_name(years_to_remove))
+
+    # Joint test of all portfolio alphas across the whole scenario grid, including this run's exclusion
+    scenario_mask(bundle, years_to_remove)
+    run_grs_test(bundle, f'{path}/DEResults/Prop1/grs_test.csv', files["results_db"])
 
 
 if __name__ == "__main__":
@@ -1,13 +1,7 @@
 import os
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-
-path = os.getcwd()
-BETA_FILE = f"{path}/DEResults/de_beta_values.csv"
-RETURNS_FILE = f"{path}/German data/DE_total_return_01-2024.csv"
-RISK_FREE_FILE = f"{path}/German data/Combined_ECB_Rates_and_Germany_3-Month_Yields.csv"
-CDAX_RETURNS_FILE = f"{path}/German data/cdax_returns_06_2024.xlsx"
+from results_db_de import save_results_to_db, scenario_name
 
 start_date, end_date = '2003-01-01', '2023-12-31'
 
@@ -66,6 +60,7 @@ def calculate_bab_factor(beta_values_df, returns_df):
 
 def plot_bab_factor(bab_factor, bab_factor_yearly):
     """Plots Monthly and Yearly BAB Factor Returns."""
+    import matplotlib.pyplot as plt
     plt.figure(figsize=(12, 6))
     plt.axhline(0, color='black', linewidth=1)
 
@@ -97,6 +92,12 @@ def plot_bab_factor(bab_factor, bab_factor_yearly):
 
 def main():
     """Main function to execute the analysis."""
+    path = os.getcwd()
+    BETA_FILE = f"{path}/DEResults/de_beta_values.csv"
+    RETURNS_FILE = f"{path}/German data/DE_total_return_01-2024.csv"
+    RISK_FREE_FILE = f"{path}/German data/Combined_ECB_Rates_and_Germany_3-Month_Yields.csv"
+    CDAX_RETURNS_FILE = f"{path}/German data/cdax_returns_06_2024.xlsx"
+
     beta_values_df = load_data(BETA_FILE)
     returns_df = load_data(RETURNS_FILE, delimiter=';')
     rf_rates_df = load_data(RISK_FREE_FILE)
@@ -108,7 +109,9 @@ def main():
     bab_factor, bab_factor_yearly = calculate_bab_factor(beta_values_df, returns_df)
     plot_bab_factor(bab_factor, bab_factor_yearly)
 
-    # bab_factor.to_csv(f'{path}/DEResults/bab_factor_de.csv')
+    bab_factor.rename("BAB Factor").to_csv(f'{path}/DEResults/bab_factor_de.csv', index_label='Date')
+    save_results_to_db(f"{path}/results.sqlite", bab_factor, 2, scenario_name([]), "bab_factor",
+                       {"start_date": start_date, "end_date": end_date})
     print(bab_factor_yearly)
     print("BAB Factor data saved successfully.")
 
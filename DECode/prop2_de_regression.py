@@ -1,19 +1,10 @@
 import os
 import pandas as pd
 import numpy as np
-import statsmodels.api as sm
-import matplotlib.pyplot as plt
-
-
-def load_data(file, delimiter=',', index_col='DATE'):
-    return pd.read_csv(file, delimiter=delimiter, index_col=index_col, parse_dates=True)
-
-
-def preprocess_data(df, start_date, end_date, years_to_remove):
-    df = df.resample('ME').last()
-    df = df.loc[start_date:end_date]
-    df = df[~df.index.year.isin(years_to_remove)]
-    return df
+from results_db_de import save_results_to_db, scenario_name
+from data_loader_de import load_sources
+from panel_bundle_de import build_panel_bundle, bundle_frame
+from jackknife_de import leave_one_year_out, jackknife_summary, save_jackknife_to_db
 
 
 def compute_ex_ante_beta(beta_values_df):
@@ -42,6 +33,7 @@ def prepare_regression_data(bab_excess_return, cdax_returns_df, rf_rates_df, fam
 
 
 def run_regression_model(dependent_var, independent_vars, data):
+    import statsmodels.api as sm
     X = sm.add_constant(data[independent_vars])
     y = data[dependent_var]
     model = sm.OLS(y, X).fit()
@@ -60,26 +52,35 @@ def main():
     }
 
     # Load data
-    beta_values_df = load_data(files["beta_values"], index_col='Date')
-    returns_df = load_data(files["returns"], delimiter=';', index_col='Date')
-    rf_rates_df = load_data(files["rf_rates"], index_col='Date')
-    cdax_returns_df = pd.read_excel(files["cdax_returns"], index_col="Date", parse_dates=True)
-    bab_factor_df = load_data(files["bab_factor"], index_col='Date')
-    fama_french_df = load_data(files["fama_french"])
+    frames = load_sources({
+        "beta_values": {"file": files["beta_values"], "index_col": "Date"},
+        "returns": {"file": files["returns"], "index_col": "Date", "delimiter": ';'},
+        "rf_rates": {"file": files["rf_rates"], "index_col": "Date"},
+        "cdax_returns": {"file": files["cdax_returns"], "index_col": "Date"},
+        "bab_factor": {"file": files["bab_factor"], "index_col": "Date"},
+        "fama_french": {"file": files["fama_french"], "index_col": "DATE"},
+    })
+    beta_values_df, returns_df, rf_rates_df = frames["beta_values"], frames["returns"], frames["rf_rates"]
+    cdax_returns_df, bab_factor_df, fama_french_df = frames["cdax_returns"], frames["bab_factor"], frames["fama_french"]
 
     rf_rates_df = rf_rates_df / 100 / 12  # Convert risk-free rates
 
     # Define date range and years to remove
     start_date, end_date = '2003-01-01', '2023-12-31'
-    years_to_remove = [2020]
+    jackknife = False  # every leave-one-year-out scenario of the BAB regressions from one pass
+    years_to_remove = [] if jackknife else [2020]
 
     # Preprocess datasets
-    beta_values_df = preprocess_data(beta_values_df, start_date, end_date, years_to_remove)
-    returns_df = preprocess_data(returns_df, start_date, end_date, years_to_remove)
-    rf_rates_df = preprocess_data(rf_rates_df, start_date, end_date, years_to_remove)
-    cdax_returns_df = preprocess_data(cdax_returns_df, start_date, end_date, years_to_remove)
-    fama_french_df = preprocess_data(fama_french_df, start_date, end_date, years_to_remove)
-    bab_factor_df = preprocess_data(bab_factor_df, start_date, end_date, years_to_remove)
+    bundle = build_panel_bundle({
+        "beta_values": beta_values_df, "returns": returns_df, "rf_rates": rf_rates_df,
+        "cdax_returns": cdax_returns_df, "fama_french": fama_french_df, "bab_factor": bab_factor_df,
+    }, start_date, end_date)
+    beta_values_df = bundle_frame(bundle, "beta_values", years_to_remove)
+    returns_df = bundle_frame(bundle, "returns", years_to_remove)
+    rf_rates_df = bundle_frame(bundle, "rf_rates", years_to_remove)
+    cdax_returns_df = bundle_frame(bundle, "cdax_returns", years_to_remove)
+    fama_french_df = bundle_frame(bundle, "fama_french", years_to_remove)
+    bab_factor_df = bundle_frame(bundle, "bab_factor", years_to_remove)
 
     # Compute key metrics
     ex_ante_bab_beta = compute_ex_ante_beta(beta_values_df)
@@ -87,6 +88,16 @@ def main():
     bab_sharpe_ratio = compute_sharpe_ratio(bab_excess_return)
     regression_data = prepare_regression_data(bab_excess_return, cdax_returns_df, rf_rates_df, fama_french_df)
 
+    if jackknife:
+        jackknife_df = leave_one_year_out(regression_data[["r_P_excess"]].rename(columns={"r_P_excess": "BAB"}),
+                                          regression_data.drop(columns="r_P_excess"))
+        summary_df = jackknife_summary(jackknife_df)
+        print(summary_df.to_string(index=False))
+        jackknife_df.to_csv(f"{path}/DEResults/bab_regression_jackknife.csv", index=False)
+        summary_df.to_csv(f"{path}/DEResults/bab_regression_jackknife_summary.csv", index=False)
+        save_jackknife_to_db(f"{path}/results.sqlite", jackknife_df, 2)
+        return
+
     # Run regressions
     capm_model = run_regression_model("r_P_excess", ["MKT"], regression_data)
     fama_french_3_model = run_regression_model("r_P_excess", ["MKT", "SMB", "HML"], regression_data)
@@ -122,8 +133,11 @@ def main():
         "Sharpe Ratio": [bab_sharpe_ratio]
     })
 
-    # Print results
+    # Print and store results
     print(bab_stats_table_full.to_string(index=False))
+    save_results_to_db(f"{path}/results.sqlite", bab_stats_table_full, 2, scenario_name(years_to_remove),
+                       "regression_table", {"start_date": start_date, "end_date": end_date},
+                       portfolio_col="Portfolio")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,212 @@
+import os
+import sys
+import json
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, urlencode
+from urllib.request import urlopen
+import pandas as pd
+import numpy as np
+
+HOST, PORT = "127.0.0.1", 8766
+
+MODELS = {
+    "CAPM": ["MKT"],
+    "Three Factor": ["MKT", "SMB", "HML"],
+    "Four Factor": ["MKT", "SMB", "HML", "UMD"],
+}
+FACTORS = MODELS["Four Factor"]
+
+
+def load_data(file_path, index_col='DATE'):
+    df = pd.read_csv(file_path, index_col=index_col, parse_dates=True)
+    return df.resample('ME').last()
+
+
+def load_panels(path):
+    """Load portfolio returns/betas, the BAB factor, the risk-free rate, the CDAX and FF factors once."""
+    portfolios_df = load_data(f"{path}/DEResults/Prop1/portfolio_returns.csv", index_col='Date')
+    betas_df = load_data(f"{path}/DEResults/Prop1/portfolio_betas.csv", index_col='Date')
+    bab_factor_df = load_data(f"{path}/DEResults/bab_factor_de.csv", index_col='Date')
+    rf_rates_df = load_data(f"{path}/German data/Combined_ECB_Rates_and_Germany_3-Month_Yields.csv", index_col='Date')
+    cdax_returns_df = pd.read_excel(f"{path}/German data/cdax_returns_06_2024.xlsx", index_col='Date', parse_dates=True)
+    cdax_returns_df = cdax_returns_df.resample('ME').last()
+    fama_french_df = load_data(f"{path}/German data/FF_DEU_Values.csv")
+
+    risk_free = rf_rates_df["Price"] / 100 / 12
+    returns = {str(col): portfolios_df[col] for col in portfolios_df}
+    returns["BAB"] = bab_factor_df["BAB Factor"]
+    excess_returns_df = pd.DataFrame(returns).sub(risk_free, axis=0)
+    betas_df.columns = [str(col) for col in betas_df.columns]
+
+    factors_df = pd.DataFrame({"MKT": cdax_returns_df["Return"] - risk_free})
+    for factor in ["SMB", "HML", "UMD"]:
+        if factor in fama_french_df.columns:
+            factors_df[factor] = fama_french_df[factor]
+
+    return excess_returns_df, betas_df, factors_df
+
+
+def build_query_index(excess_returns_df, betas_df, factors_df):
+    """Prefix sums over the monthly calendar so any window is two lookups and a subtraction.
+
+    For every asset the first-order sums (count, return, squared return, ex-ante beta) cover all
+    months with a return; the regression cross-products [1, r, factors] cover months where the
+    return and every factor are available, like the dropna() in the regression scripts.
+    """
+    dates = excess_returns_df.index.union(factors_df.index).union(betas_df.index)
+    excess_returns_df = excess_returns_df.reindex(dates)
+    factors = factors_df.reindex(index=dates, columns=FACTORS).to_numpy(dtype=float)
+    betas_df = betas_df.reindex(dates)
+
+    def prefix(values):
+        # Leading zero row so that the sum over months [i, j) is prefix[j] - prefix[i]
+        return np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(values, axis=0)])
+
+    assets = {}
+    for asset in excess_returns_df.columns:
+        r = excess_returns_df[asset].to_numpy(dtype=float)
+        has_return = np.isfinite(r)
+        beta = betas_df[asset].to_numpy(dtype=float) if asset in betas_df else np.full(len(dates), np.nan)
+        has_beta = np.isfinite(beta)
+        moments = np.column_stack([has_return, np.where(has_return, r, 0.0), np.where(has_return, r ** 2, 0.0),
+                                   has_beta, np.where(has_beta, beta, 0.0)])
+
+        complete = has_return & np.isfinite(factors).all(axis=1)
+        design = np.column_stack([np.ones(len(dates)), r, factors])
+        design = np.where(complete[:, None], design, 0.0)
+        cross_products = design[:, :, None] * design[:, None, :]
+
+        assets[str(asset)] = {"moments": prefix(moments), "cross_products": prefix(cross_products)}
+
+    return {"dates": dates, "assets": assets}
+
+
+def window_sum(index, prefix, start_date, end_date, years_to_exclude):
+    """Sum of a prefix-summed quantity over [start_date, end_date] minus the excluded calendar years."""
+    dates = index["dates"]
+    lo = dates.searchsorted(pd.Timestamp(start_date), side='left')
+    hi = dates.searchsorted(pd.Timestamp(end_date), side='right')
+    total = prefix[hi] - prefix[lo]
+    for year in set(int(year) for year in years_to_exclude):
+        year_lo = max(lo, dates.searchsorted(pd.Timestamp(f"{year}-01-01"), side='left'))
+        year_hi = min(hi, dates.searchsorted(pd.Timestamp(f"{year}-12-31"), side='right'))
+        if year_hi > year_lo:
+            total = total - (prefix[year_hi] - prefix[year_lo])
+    return total
+
+
+def query_stats(index, asset, start_date='1900-01-01', end_date='2100-12-31', years_to_exclude=()):
+    """Mean, volatility, Sharpe ratio, ex-ante beta and factor alphas of one asset over a window."""
+    sums = index["assets"][str(asset)]
+    n, s1, s2, n_beta, s_beta = window_sum(index, sums["moments"], start_date, end_date, years_to_exclude)
+    cross_products = window_sum(index, sums["cross_products"], start_date, end_date, years_to_exclude)
+
+    mean = s1 / n if n else np.nan
+    volatility = np.sqrt((s2 - n * mean ** 2) / (n - 1)) if n > 1 else np.nan
+    result = {
+        "Asset": str(asset),
+        "Months": int(n),
+        "Excess Return": mean,
+        "Volatility": volatility,
+        "Sharpe Ratio": mean / volatility * np.sqrt(12) if volatility else np.nan,
+        "Beta (Ex-Ante)": s_beta / n_beta if n_beta else np.nan,
+    }
+
+    n_reg = cross_products[0, 0]
+    yy = cross_products[1, 1]
+    y_mean = cross_products[0, 1] / n_reg if n_reg else np.nan
+    for model, factors in MODELS.items():
+        columns = [0] + [2 + FACTORS.index(factor) for factor in factors]
+        k = len(columns)
+        xtx = cross_products[np.ix_(columns, columns)]
+        xty = cross_products[columns, 1]
+        if n_reg <= k or np.linalg.matrix_rank(xtx) < k:
+            result.update({f"{model} Alpha": np.nan, f"{model} Alpha t-stat": np.nan, f"{model} R²": np.nan})
+            continue
+        xtx_inv = np.linalg.inv(xtx)
+        coefficients = xtx_inv @ xty
+        ssr = yy - coefficients @ xty
+        sst = yy - n_reg * y_mean ** 2
+        alpha_se = np.sqrt(ssr / (n_reg - k) * xtx_inv[0, 0])
+        result.update({
+            f"{model} Alpha": coefficients[0],
+            f"{model} Alpha t-stat": coefficients[0] / alpha_se,
+            f"{model} R²": 1 - ssr / sst,
+        })
+
+    return {key: (float(value) if isinstance(value, (float, np.floating)) else value) for key, value in result.items()}
+
+
+def make_handler(index):
+    class QueryHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            request = urlparse(self.path)
+            params = {key: values[0] for key, values in parse_qs(request.query).items()}
+            try:
+                if request.path == "/assets":
+                    body = sorted(index["assets"])
+                elif request.path == "/stats":
+                    years = [year for year in params.get("exclude", "").split(",") if year]
+                    body = query_stats(index, params["asset"], params.get("start", "1900-01-01"),
+                                       params.get("end", "2100-12-31"), years)
+                else:
+                    self.send_error(404)
+                    return
+                status = 200
+            except (KeyError, ValueError) as e:
+                body, status = {"error": f"{type(e).__name__}: {e}"}, 400
+
+            payload = json.dumps(body, allow_nan=True).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return QueryHandler
+
+
+def serve(path, host=HOST, port=PORT):
+    """Load everything once and answer /stats queries until interrupted."""
+    index = build_query_index(*load_panels(path))
+    server = ThreadingHTTPServer((host, port), make_handler(index))
+    print(f"Serving DE BAB/portfolio queries on http://{host}:{port} ({len(index['assets'])} assets)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+def query(asset, start_date, end_date, years_to_exclude, host=HOST, port=PORT):
+    """Ask a running service for the statistics of one asset."""
+    params = urlencode({"asset": asset, "start": start_date, "end": end_date, "exclude": ",".join(years_to_exclude)})
+    with urlopen(f"http://{host}:{port}/stats?{params}") as response:
+        return json.loads(response.read())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="In-memory query service for DE BAB and portfolio statistics")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve")
+    serve_parser.add_argument("--port", type=int, default=PORT)
+    query_parser = subparsers.add_parser("query")
+    query_parser.add_argument("asset", help="portfolio id (1-5) or BAB")
+    query_parser.add_argument("--start", default="1900-01-01")
+    query_parser.add_argument("--end", default="2100-12-31")
+    query_parser.add_argument("--exclude", nargs="*", default=[], help="calendar years to leave out")
+    query_parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        serve(os.getcwd(), port=args.port)
+    else:
+        result = query(args.asset, args.start, args.end, args.exclude, port=args.port)
+        print(pd.Series(result).to_string())
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
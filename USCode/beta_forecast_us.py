@@ -0,0 +1,138 @@
+import os
+import pandas as pd
+import numpy as np
+from beta_estimators_us import BETA_ESTIMATORS, SHRINKAGE_METHODS, rolling_regression_moments
+import betas_us
+from winsorize_us import winsorize_cross_section
+from results_db_us import save_results_to_db, scenario_name
+
+# Configurations scored by main(); estimator keyword arguments go next to the three named keys
+FORECAST_GRID = [
+    {"estimator": "correlation", "shrinkage": "vasicek", "shrinkage_factor": 1.0},
+    {"estimator": "correlation", "shrinkage": "vasicek", "shrinkage_factor": 0.8},
+    {"estimator": "correlation", "shrinkage": "vasicek", "shrinkage_factor": 0.6},
+    {"estimator": "correlation", "shrinkage": "vasicek", "shrinkage_factor": 0.4},
+    {"estimator": "ols", "shrinkage": "vasicek", "shrinkage_factor": 0.6, "window": 36},
+    {"estimator": "ols", "shrinkage": "vasicek", "shrinkage_factor": 0.6, "window": 60},
+    {"estimator": "ols", "shrinkage": "bayesian", "window": 60},
+    {"estimator": "dimson", "shrinkage": "vasicek", "shrinkage_factor": 0.6},
+    {"estimator": "ewma", "shrinkage": "vasicek", "shrinkage_factor": 0.6},
+]
+
+
+def estimator_kwargs(config):
+    return {key: value for key, value in config.items() if key not in ("estimator", "shrinkage", "shrinkage_factor")}
+
+
+def config_label(config):
+    """Readable key of one grid entry, e.g. 'ols/vasicek 0.6 window=36'."""
+    label = f"{config['estimator']}/{config['shrinkage']}"
+    if config["shrinkage"] == "vasicek":
+        label += f" {config.get('shrinkage_factor', 0.6)}"
+    kwargs = estimator_kwargs(config)
+    return " ".join([label] + [f"{key}={value}" for key, value in sorted(kwargs.items())])
+
+
+def realized_forward_betas(stock_excess_returns, market_excess_return, horizon=12, min_periods=None):
+    """OLS beta of every stock over months t+1 .. t+horizon, stamped at month t.
+
+    The rolling regression ending at t+horizon covers exactly that window, so the whole panel
+    is one set of rolling sums shifted back by the horizon.
+    """
+    beta, _ = rolling_regression_moments(stock_excess_returns, market_excess_return, window=horizon,
+                                         min_periods=min_periods or horizon)
+    return beta.shift(-horizon)
+
+
+def forecast_grid(stock_excess_returns, market_excess_return, configs=FORECAST_GRID):
+    """Ex-ante betas of every configuration as one configs x months x stocks array.
+
+    Raw betas are estimated once per estimator and keyword set; the shrinkage variants of the
+    same raw betas are then only a rescaling each.
+    """
+    raw = {}
+    forecasts = np.empty((len(configs),) + stock_excess_returns.shape)
+    for c, config in enumerate(configs):
+        kwargs = estimator_kwargs(config)
+        key = (config["estimator"], tuple(sorted(kwargs.items())))
+        if key not in raw:
+            raw[key] = BETA_ESTIMATORS[config["estimator"]](stock_excess_returns, market_excess_return, **kwargs)
+        beta_df, beta_variance_df = raw[key]
+        forecasts[c] = SHRINKAGE_METHODS[config["shrinkage"]](
+            beta_df, beta_variance_df, shrinkage_factor=config.get("shrinkage_factor", 0.6)).to_numpy(dtype=float)
+    return forecasts
+
+
+def score_forecasts(forecasts, realized, labels, common=True):
+    """MSE, bias, MAE and mean monthly rank correlation of every configuration in one batch.
+
+    forecasts is configs x months x stocks and realized months x stocks. With common=True every
+    configuration is scored on the same stock-months, those where all of them and the realized
+    beta exist, so the grid compares estimators and not their coverage.
+    """
+    valid = np.isfinite(forecasts) & np.isfinite(realized)[None]
+    if common:
+        valid = np.broadcast_to(valid.all(axis=0), valid.shape)
+    errors = np.where(valid, forecasts - realized[None], 0.0)
+    observations = valid.sum(axis=(1, 2))
+
+    # Cross-sectional Spearman correlation of every config and month: ranks of the masked
+    # forecasts and realized betas over stocks, then a row-wise Pearson correlation
+    num_configs, num_months, num_stocks = forecasts.shape
+    forecast_ranks = pd.DataFrame(np.where(valid, forecasts, np.nan).reshape(-1, num_stocks)).rank(axis=1)
+    realized_ranks = pd.DataFrame(np.where(valid, realized[None], np.nan).reshape(-1, num_stocks)).rank(axis=1)
+    forecast_ranks = forecast_ranks.sub(forecast_ranks.mean(axis=1), axis=0).to_numpy()
+    realized_ranks = realized_ranks.sub(realized_ranks.mean(axis=1), axis=0).to_numpy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rank_correlation = (np.nansum(forecast_ranks * realized_ranks, axis=1)
+                            / np.sqrt(np.nansum(forecast_ranks ** 2, axis=1) * np.nansum(realized_ranks ** 2, axis=1)))
+    rank_correlation = rank_correlation.reshape(num_configs, num_months)
+    enough = valid.sum(axis=2) >= 3
+    monthly = np.where(enough, rank_correlation, 0.0)
+
+    return pd.DataFrame({
+        "Configuration": labels,
+        "MSE": (errors ** 2).sum(axis=(1, 2)) / observations,
+        "Bias": errors.sum(axis=(1, 2)) / observations,
+        "MAE": np.abs(errors).sum(axis=(1, 2)) / observations,
+        "Rank Correlation": monthly.sum(axis=1) / enough.sum(axis=1),
+        "Months": enough.sum(axis=1),
+        "Observations": observations,
+    })
+
+
+def evaluate_beta_forecasts(stock_excess_returns, market_excess_return, configs=FORECAST_GRID, horizon=12,
+                            common=True):
+    """Score every configuration's ex-ante beta against the realized beta of the next horizon months."""
+    realized = realized_forward_betas(stock_excess_returns, market_excess_return, horizon).to_numpy(dtype=float)
+    forecasts = forecast_grid(stock_excess_returns, market_excess_return, configs)
+    return score_forecasts(forecasts, realized, [config_label(config) for config in configs], common)
+
+
+def main():
+    path = os.getcwd()
+    # Inputs and winsorization of the beta stage, so the forecasts are the betas it would produce
+    config = betas_us.default_config(path)
+    OUTPUT_FILE = f"{path}/USResults/beta_forecast_accuracy.csv"
+    RESULTS_DB = f"{path}/results.sqlite"
+    horizon = 12
+
+    rates_df, sp500_df, returns_df = betas_us.load_and_prepare_data(config["rates_file"], config["sp500_file"],
+                                                                    config["returns_file"])
+    monthly_returns_df, monthly_sp500_df, monthly_rates_df = betas_us.resample_and_transform_data(rates_df, sp500_df,
+                                                                                                  returns_df)
+    monthly_returns_df = winsorize_cross_section(monthly_returns_df, config["winsorize_limits"])
+
+    # Same excess returns as calculate_shrinkage_beta, so the 0.6 correlation row is the thesis beta
+    stock_excess_returns = monthly_returns_df.sub(monthly_rates_df['TB3MS'], axis=0)
+    accuracy = evaluate_beta_forecasts(stock_excess_returns, monthly_sp500_df['Excess Return'], FORECAST_GRID, horizon)
+
+    print(accuracy.sort_values("MSE").to_string(index=False))
+    accuracy.to_csv(OUTPUT_FILE, index=False)
+    save_results_to_db(RESULTS_DB, accuracy, 1, scenario_name([]), "beta_forecast_accuracy",
+                       {"horizon": horizon, "winsorize_limits": config["winsorize_limits"]},
+                       portfolio_col="Configuration")
+
+
+if __name__ == "__main__":
+    main()
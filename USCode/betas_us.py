@@ -1,97 +1,408 @@
 import pandas as pd
 import numpy as np
 import os
+import json
+import shutil
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from beta_estimators_us import calculate_ts_beta, estimate_betas
+from winsorize_us import winsorize_cross_section, cross_section_bounds
+from validation_us import validate_inputs
+from delisting_us import load_delisting_returns, merge_delisting_returns, month_codes, compound_delisting
 
-def load_and_prepare_data(rates_file, sp500_file, returns_file):
+def load_market_and_rates(rates_file, sp500_file):
     rates_df = pd.read_csv(rates_file)
     sp500_df = pd.read_csv(sp500_file)
-    returns_df = pd.read_csv(returns_file)
 
     rates_df['DATE'] = pd.to_datetime(rates_df['DATE'], format='%Y-%m-%d')
     sp500_df['Date'] = pd.to_datetime(sp500_df['Date'], format='%m-%d-%y')
-    returns_df['date'] = pd.to_datetime(returns_df['date'], format='%d%b%Y')
 
     rates_df= rates_df.set_index('DATE')
     sp500_df = sp500_df.set_index('Date')
 
+    return rates_df, sp500_df
+
+def load_and_prepare_data(rates_file, sp500_file, returns_file, delisting_file=None):
+    rates_df, sp500_df = load_market_and_rates(rates_file, sp500_file)
+    returns_df = pd.read_csv(returns_file)
+
+    returns_df['date'] = pd.to_datetime(returns_df['date'], format='%d%b%Y', errors='coerce')
+
+    # Fail on broken inputs here, before the pivot and the estimation
+    validate_inputs({
+        "returns": {"frame": returns_df, "unit": "decimal_return", "columns": ["ret"], "keys": ["permno", "date"],
+                    "date_col": "date"},
+        "sp500": {"frame": sp500_df, "unit": "decimal_return", "columns": ["Return"]},
+        "rates": {"frame": rates_df, "unit": "percent_rate", "columns": ["TB3MS"]},
+    }, '2003-01-01', '2023-12-31')
+
+    if delisting_file:
+        returns_df = merge_delisting_returns(returns_df, load_delisting_returns(delisting_file))
+
     returns_df = returns_df.pivot(index="date", columns="permno", values="ret")
     returns_df.columns = returns_df.columns.astype(str)
 
     return rates_df, sp500_df, returns_df
 
-def resample_and_transform_data(rates_df, sp500_df, returns_df):
+def resample_market_and_rates(rates_df, sp500_df):
     sp500_df['Return'] = pd.to_numeric(sp500_df['Return'], errors='coerce')
 
     # Convert all dates to end-of-month
     sp500_df.index = sp500_df.index + pd.offsets.MonthEnd(0)
     rates_df.index = rates_df.index + pd.offsets.MonthEnd(0)
-    returns_df.index = returns_df.index + pd.offsets.MonthEnd(0)
 
-    # monthly_returns_df = returns_df.resample('ME').mean()
     monthly_sp500_df = sp500_df.resample('ME').mean()
     monthly_rates_df = rates_df.resample('ME').mean()
 
-    returns_df = returns_df[returns_df.index.is_month_end]
+    return monthly_sp500_df, monthly_rates_df
 
-    common_dates = monthly_sp500_df.index.intersection(monthly_rates_df.index).intersection(returns_df.index)
+def transform_market_and_rates(monthly_sp500_df, monthly_rates_df, common_dates):
     monthly_sp500_df = monthly_sp500_df.loc[common_dates]
     monthly_rates_df = monthly_rates_df.loc[common_dates]
-    returns_df = returns_df.loc[common_dates]
 
     monthly_sp500_df['Return'] = np.log(1 + monthly_sp500_df['Return'])
     monthly_rates_df['TB3MS'] = pd.to_numeric(monthly_rates_df['TB3MS']) / 100 / 12
 
     monthly_sp500_df['Excess Return'] = monthly_sp500_df['Return'] - monthly_rates_df['TB3MS']
 
+    return monthly_sp500_df, monthly_rates_df
+
+def filter_sample_period(df, start_date='2003-01-01', end_date='2023-12-31'):
+    return df[(df.index >= start_date) & (df.index <= end_date)]
+
+def resample_and_transform_data(rates_df, sp500_df, returns_df):
+    monthly_sp500_df, monthly_rates_df = resample_market_and_rates(rates_df, sp500_df)
+
+    returns_df.index = returns_df.index + pd.offsets.MonthEnd(0)
+    returns_df = returns_df[returns_df.index.is_month_end]
+
+    common_dates = monthly_sp500_df.index.intersection(monthly_rates_df.index).intersection(returns_df.index)
+    monthly_sp500_df, monthly_rates_df = transform_market_and_rates(monthly_sp500_df, monthly_rates_df, common_dates)
+    returns_df = returns_df.loc[common_dates]
+
     monthly_returns_df = np.log(1 + returns_df).sub(monthly_rates_df['TB3MS'], axis=0)
 
     # Filter data for the period 01.01.2003 - 31.12.2023 after resampling
-    start_date, end_date = '2003-01-01', '2023-12-31'
-    monthly_returns_df = monthly_returns_df[(monthly_returns_df.index >= start_date) & (monthly_returns_df.index <= end_date)]
-    monthly_sp500_df = monthly_sp500_df[(monthly_sp500_df.index >= start_date) & (monthly_sp500_df.index <= end_date)]
-    monthly_rates_df = monthly_rates_df[(monthly_rates_df.index >= start_date) & (monthly_rates_df.index <= end_date)]
+    monthly_returns_df = filter_sample_period(monthly_returns_df)
+    monthly_sp500_df = filter_sample_period(monthly_sp500_df)
+    monthly_rates_df = filter_sample_period(monthly_rates_df)
 
     return monthly_returns_df, monthly_sp500_df, monthly_rates_df
 
 def calculate_shrinkage_beta(monthly_returns_df, monthly_sp500_df, monthly_rates_df, shrinkage_factor=0.6):
-    beta_df = pd.DataFrame(index=monthly_returns_df.index, columns=monthly_returns_df.columns)
-
-    for stock in monthly_returns_df.columns:
-        stock_excess_return = monthly_returns_df[stock] - monthly_rates_df['TB3MS']
+    stock_excess_returns = monthly_returns_df.sub(monthly_rates_df['TB3MS'], axis=0)
 
-        rolling_correlation = (
-            stock_excess_return
-            .rolling(window=60, min_periods=36)
-            .corr(monthly_sp500_df['Excess Return'])
-        )
-        stock_volatility = stock_excess_return.rolling(window=12, min_periods=12).std()
-        market_volatility = monthly_sp500_df['Excess Return'].rolling(window=12, min_periods=12).std()
-
-        # Compute time-series estimated beta
-        ts_beta = rolling_correlation * (stock_volatility / market_volatility)
-        beta_df[stock] = ts_beta
+    # Compute time-series estimated beta
+    beta_df = calculate_ts_beta(stock_excess_returns, monthly_sp500_df['Excess Return'])
 
     # Compute cross-sectional mean beta
     beta_xs = beta_df.mean(axis=1)  # Mean beta at each time step
 
     # Apply Vasicek shrinkage adjustment
-    shrinkage_beta_df = beta_df.apply(lambda col: shrinkage_factor * col + (1 - shrinkage_factor) * beta_xs, axis=0)
+    shrinkage_beta_df = beta_df.mul(shrinkage_factor).add((1 - shrinkage_factor) * beta_xs, axis=0)
 
     return shrinkage_beta_df
 
+def calculate_beta(monthly_returns_df, monthly_sp500_df, monthly_rates_df, estimator='correlation',
+                   shrinkage='vasicek', shrinkage_factor=0.6, **estimator_kwargs):
+    """Any estimator/shrinkage pair from beta_estimators_us on the same excess returns as calculate_shrinkage_beta."""
+    stock_excess_returns = monthly_returns_df.sub(monthly_rates_df['TB3MS'], axis=0)
+    return estimate_betas(stock_excess_returns, monthly_sp500_df['Excess Return'], estimator, shrinkage,
+                          shrinkage_factor, **estimator_kwargs)
+
+def atomic_write(target, write):
+    """Call write(path) on a temporary file next to target, then rename it over target in one step."""
+    temporary = f'{target}.tmp'
+    write(temporary)
+    os.replace(temporary, target)
+
+def write_json(target, obj):
+    def write(path):
+        with open(path, 'w') as f:
+            json.dump(obj, f)
+    atomic_write(target, write)
+
+def file_signature(file):
+    stat = os.stat(file)
+    return {'file': os.path.abspath(file), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def build_returns_store(returns_file, store_dir, chunksize=1_000_000, delisting_file=None):
+    """Stream the long CRSP file into a column-major (date x permno) memory-mapped return store.
+
+    Delisting returns, if given, are compounded into their (permno, month) cells once the
+    returns are in place. The store is published only once complete; a rerun on the same
+    returns and delisting files reuses it.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    manifest_file = f'{store_dir}/store.json'
+    signature = file_signature(returns_file)
+    if delisting_file:
+        signature['delisting'] = file_signature(delisting_file)
+    if os.path.exists(manifest_file):
+        with open(manifest_file) as f:
+            if json.load(f) == signature:
+                return (pd.DatetimeIndex(np.load(f'{store_dir}/dates.npy')),
+                        np.load(f'{store_dir}/permnos.npy'))
+        os.remove(manifest_file)
+
+    # Pass 1: collect the calendar and the universe without holding the panel
+    dates, permnos = set(), set()
+    for chunk in pd.read_csv(returns_file, usecols=['permno', 'date'], chunksize=chunksize):
+        dates.update(pd.to_datetime(chunk['date'], format='%d%b%Y').unique())
+        permnos.update(chunk['permno'].unique())
+    dates = pd.DatetimeIndex(sorted(dates))
+    permnos = np.array(sorted(permnos))
+
+    store = np.lib.format.open_memmap(f'{store_dir}/returns.npy.tmp', mode='w+', dtype=np.float64,
+                                      shape=(len(dates), len(permnos)), fortran_order=True)
+    store[:] = np.nan
+
+    # Pass 2: scatter each chunk into its (date, permno) cells
+    for chunk in pd.read_csv(returns_file, usecols=['permno', 'date', 'ret'], chunksize=chunksize):
+        rows = dates.get_indexer(pd.to_datetime(chunk['date'], format='%d%b%Y'))
+        cols = np.searchsorted(permnos, chunk['permno'].to_numpy())
+        store[rows, cols] = pd.to_numeric(chunk['ret'], errors='coerce').to_numpy()
+
+    if delisting_file:
+        # Every (month, permno) of the grid has a cell, so a delisting month without a return row
+        # is filled with dlret; only delistings outside the calendar or universe are dropped
+        delisting_df = load_delisting_returns(delisting_file)
+        date_months, delisting_months = month_codes(dates), month_codes(delisting_df['dlstdt'])
+        delisting_permnos = delisting_df['permno'].to_numpy()
+        rows = np.searchsorted(date_months, delisting_months, side='right') - 1
+        cols = np.minimum(np.searchsorted(permnos, delisting_permnos), len(permnos) - 1)
+        inside = (rows >= 0) & (date_months[rows] == delisting_months) & (permnos[cols] == delisting_permnos)
+        rows, cols = rows[inside], cols[inside]
+        store[rows, cols] = compound_delisting(store[rows, cols], delisting_df['dlret'].to_numpy(dtype=float)[inside])
+
+    store.flush()
+    del store
+    os.replace(f'{store_dir}/returns.npy.tmp', f'{store_dir}/returns.npy')
+
+    np.save(f'{store_dir}/dates.npy', dates.values)
+    np.save(f'{store_dir}/permnos.npy', permnos.astype(str))
+    write_json(manifest_file, signature)
+    return dates, permnos
+
+def store_winsorization_bounds(store_dir, row_index, risk_free_rate, limits, row_block=12):
+    """Per-date winsorization bounds of the monthly excess returns over the whole store universe.
+
+    The cross-section of a date spans every chunk, so the bounds are computed up front, a block
+    of dates at a time, from the same values winsorize_cross_section sees in memory.
+    """
+    returns = np.load(f'{store_dir}/returns.npy', mmap_mode='r')
+    rates = risk_free_rate.to_numpy()
+    lower, upper = np.empty(len(row_index)), np.empty(len(row_index))
+    for start in range(0, len(row_index), row_block):
+        stop = min(start + row_block, len(row_index))
+        block = np.log(1 + returns[row_index[start:stop]]) - rates[start:stop, None]
+        lower[start:stop], upper[start:stop] = cross_section_bounds(block, limits)
+    return lower, upper
+
+def check_returns_store(returns_file, store_dir, delisting_file=None):
+    """Raise if the return store differs from the in-memory path's panel of the same files.
+
+    Holds the whole panel in memory once, so it validates the out-of-core path (e.g. on a
+    sample or after changing either path) rather than running on every estimation.
+    """
+    returns_df = pd.read_csv(returns_file)
+    returns_df['date'] = pd.to_datetime(returns_df['date'], format='%d%b%Y')
+    if delisting_file:
+        returns_df = merge_delisting_returns(returns_df, load_delisting_returns(delisting_file))
+    returns_df['ret'] = pd.to_numeric(returns_df['ret'], errors='coerce')
+    panel = returns_df.pivot(index='date', columns='permno', values='ret')
+    panel.columns = panel.columns.astype(str)
+
+    dates = pd.DatetimeIndex(np.load(f'{store_dir}/dates.npy'))
+    permnos = np.load(f'{store_dir}/permnos.npy')
+    if not (panel.index.equals(dates) and panel.columns.equals(pd.Index(permnos))):
+        raise ValueError(f"Return store in {store_dir} covers other dates or permnos than {returns_file}")
+    store = np.load(f'{store_dir}/returns.npy', mmap_mode='r')
+    differing = ~((store == panel.to_numpy()) | (np.isnan(store) & panel.isna().to_numpy()))
+    if differing.any():
+        raise ValueError(f"Return store in {store_dir} differs from the in-memory panel in {differing.sum()} cells")
+
+def process_beta_chunk(store_dir, start, stop, row_index, market_excess_return, risk_free_rate, bounds=None):
+    """Time-series betas for store columns [start, stop); returns the per-date sum and count for the shrinkage mean."""
+    returns = np.load(f'{store_dir}/returns.npy', mmap_mode='r')
+    chunk = pd.DataFrame(returns[row_index, start:stop], index=market_excess_return.index)
+
+    # Same transformation as resample_and_transform_data, winsorize_cross_section and calculate_shrinkage_beta
+    monthly_returns = np.log(1 + chunk).sub(risk_free_rate, axis=0)
+    if bounds is not None:
+        lower, upper = bounds
+        monthly_returns = pd.DataFrame(np.clip(monthly_returns.to_numpy(), lower[:, None], upper[:, None]),
+                                       index=monthly_returns.index)
+    ts_beta = calculate_ts_beta(monthly_returns.sub(risk_free_rate, axis=0), market_excess_return)
+
+    raw_betas = np.load(f'{store_dir}/raw_betas.npy', mmap_mode='r+')
+    raw_betas[:, start:stop] = ts_beta.to_numpy()
+    raw_betas.flush()
+
+    return ts_beta.sum(axis=1).to_numpy(), ts_beta.count(axis=1).to_numpy()
+
+def save_chunk_checkpoint(checkpoint_dir, start, chunk_sum, chunk_count):
+    """Mark a stock chunk done; written only after its raw betas are flushed, so a marker implies complete data."""
+    def write(path):
+        with open(path, 'wb') as f:
+            np.savez(f, sum=chunk_sum, count=chunk_count)
+    atomic_write(f'{checkpoint_dir}/chunk_{start:09d}.npz', write)
+
+def open_checkpoints(checkpoint_dir, run_config, resume):
+    """Reuse the checkpoints of an interrupted run with the same configuration, otherwise start clean."""
+    config_file = f'{checkpoint_dir}/run.json'
+    if resume and os.path.exists(config_file):
+        with open(config_file) as f:
+            if json.load(f) == run_config:
+                return True
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    os.makedirs(checkpoint_dir)
+    write_json(config_file, run_config)
+    return False
+
+def calculate_shrinkage_beta_out_of_core(store_dir, monthly_sp500_df, monthly_rates_df, output_file,
+                                         shrinkage_factor=0.6, chunk_size=2000, max_workers=None, row_block=12,
+                                         resume=True, winsorize_limits=None):
+    """Chunked, process-parallel calculate_shrinkage_beta over a memory-mapped return store.
+
+    Peak memory is bounded by the chunk size: pass 1 computes the time-series betas chunk by chunk
+    and reduces the cross-sectional mean, pass 2 applies the Vasicek shrinkage and streams the
+    beta matrix to the output CSV a block of dates at a time. With winsorize_limits, the per-date
+    bounds are computed over the whole universe before pass 1 and every chunk is clipped to them.
+
+    Both passes checkpoint under {store_dir}/checkpoints: every finished stock chunk leaves a
+    marker with its partial sums, and every written block of dates records the byte length of
+    the partial CSV. A rerun with resume=True skips finished chunks, truncates the CSV to the
+    last recorded block and continues; sums are always reduced in chunk order, so the output
+    is byte-identical to an uninterrupted run. The CSV replaces output_file only when complete.
+    """
+    store_dates = pd.DatetimeIndex(np.load(f'{store_dir}/dates.npy')) + pd.offsets.MonthEnd(0)
+    permnos = np.load(f'{store_dir}/permnos.npy')
+
+    common_dates = monthly_sp500_df.index.intersection(monthly_rates_df.index).intersection(store_dates)
+    monthly_sp500_df, monthly_rates_df = transform_market_and_rates(monthly_sp500_df, monthly_rates_df, common_dates)
+    monthly_sp500_df = filter_sample_period(monthly_sp500_df)
+    monthly_rates_df = filter_sample_period(monthly_rates_df)
+    row_index = store_dates.get_indexer(monthly_sp500_df.index)
+    num_dates, num_stocks = len(row_index), len(permnos)
+
+    checkpoint_dir = f'{store_dir}/checkpoints'
+    inputs = np.concatenate([monthly_sp500_df['Excess Return'].to_numpy(), monthly_rates_df['TB3MS'].to_numpy(),
+                             row_index.astype(float)])
+    run_config = {
+        'store': file_signature(f'{store_dir}/returns.npy'),
+        'inputs': hashlib.sha256(inputs.tobytes()).hexdigest(),
+        'shrinkage_factor': shrinkage_factor, 'chunk_size': chunk_size, 'row_block': row_block,
+        'winsorize_limits': list(winsorize_limits) if winsorize_limits is not None else None,
+        'output_file': os.path.abspath(output_file),
+    }
+    resumed = open_checkpoints(checkpoint_dir, run_config, resume)
+    if not resumed:
+        raw_betas = np.lib.format.open_memmap(f'{store_dir}/raw_betas.npy', mode='w+', dtype=np.float64,
+                                              shape=(num_dates, num_stocks), fortran_order=True)
+        del raw_betas
+
+    # Pass 1: time-series betas per chunk of stocks, reduced to per-date sums and counts
+    chunk_starts = range(0, num_stocks, chunk_size)
+    pending = [start for start in chunk_starts if not os.path.exists(f'{checkpoint_dir}/chunk_{start:09d}.npz')]
+    if pending:
+        bounds = None
+        if winsorize_limits is not None:
+            bounds = store_winsorization_bounds(store_dir, row_index, monthly_rates_df['TB3MS'], winsorize_limits,
+                                                row_block)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                start: executor.submit(process_beta_chunk, store_dir, start, min(start + chunk_size, num_stocks),
+                                       row_index, monthly_sp500_df['Excess Return'], monthly_rates_df['TB3MS'], bounds)
+                for start in pending
+            }
+            for start, future in futures.items():
+                save_chunk_checkpoint(checkpoint_dir, start, *future.result())
+
+    beta_sum, beta_count = np.zeros(num_dates), np.zeros(num_dates)
+    for start in chunk_starts:
+        with np.load(f'{checkpoint_dir}/chunk_{start:09d}.npz') as checkpoint:
+            beta_sum += checkpoint['sum']
+            beta_count += checkpoint['count']
+
+    with np.errstate(invalid='ignore'):
+        beta_xs = beta_sum / beta_count
+
+    # Pass 2: shrink toward the cross-sectional mean and write the beta matrix block by block
+    partial_file, progress_file = f'{output_file}.partial', f'{checkpoint_dir}/csv_progress.json'
+    first_block, written = 0, 0
+    if os.path.exists(progress_file) and os.path.exists(partial_file):
+        with open(progress_file) as f:
+            progress = json.load(f)
+        first_block, written = progress['next_block'], progress['bytes']
+
+    raw_betas = np.load(f'{store_dir}/raw_betas.npy', mmap_mode='r')
+    with open(partial_file, 'r+b' if written else 'wb') as out:
+        out.truncate(written)
+        out.seek(written)
+        for start in range(first_block, num_dates, row_block):
+            stop = min(start + row_block, num_dates)
+            block = shrinkage_factor * raw_betas[start:stop] + (1 - shrinkage_factor) * beta_xs[start:stop, None]
+            block_df = pd.DataFrame(block, index=monthly_sp500_df.index[start:stop], columns=permnos)
+            out.write(block_df.to_csv(header=start == 0, index_label='Date').encode())
+            out.flush()
+            os.fsync(out.fileno())
+            write_json(progress_file, {'next_block': stop, 'bytes': out.tell()})
+
+    os.replace(partial_file, output_file)
+    shutil.rmtree(checkpoint_dir)
+
 def save_beta_to_csv(beta_df, output_file):
-    beta_df.to_csv(output_file)
+    # A killed write must not leave a truncated file behind under the final name; the 'Date'
+    # header is what prop2 and the regression scripts read the index by
+    atomic_write(output_file, lambda f: beta_df.to_csv(f, index_label='Date'))
+
+def main(rates_file, sp500_file, returns_file, output_file, out_of_core=False, store_dir=None,
+         estimator='correlation', shrinkage='vasicek', winsorize_limits=None, resume=True, delisting_file=None,
+         check_store=False):
+    if out_of_core and (estimator, shrinkage) != ('correlation', 'vasicek'):
+        # The store path only implements the thesis beta; other estimators run in memory
+        print(f"out_of_core covers the correlation/vasicek beta only; estimating {estimator}/{shrinkage} in memory")
+        out_of_core = False
 
-def main(rates_file, sp500_file, returns_file, output_file):
-    rates_df, sp500_df, returns_df = load_and_prepare_data(rates_file, sp500_file, returns_file)
+    if out_of_core:
+        rates_df, sp500_df = load_market_and_rates(rates_file, sp500_file)
+        validate_inputs({
+            "sp500": {"frame": sp500_df, "unit": "decimal_return", "columns": ["Return"]},
+            "rates": {"frame": rates_df, "unit": "percent_rate", "columns": ["TB3MS"]},
+        }, '2003-01-01', '2023-12-31')
+        monthly_sp500_df, monthly_rates_df = resample_market_and_rates(rates_df, sp500_df)
+        build_returns_store(returns_file, store_dir, delisting_file=delisting_file)
+        if check_store:
+            check_returns_store(returns_file, store_dir, delisting_file)
+        calculate_shrinkage_beta_out_of_core(store_dir, monthly_sp500_df, monthly_rates_df, output_file, resume=resume,
+                                             winsorize_limits=winsorize_limits)
+        return
+
+    rates_df, sp500_df, returns_df = load_and_prepare_data(rates_file, sp500_file, returns_file, delisting_file)
     monthly_returns_df, monthly_sp500_df, monthly_rates_df = resample_and_transform_data(rates_df, sp500_df, returns_df)
-    beta_df = calculate_shrinkage_beta(monthly_returns_df, monthly_sp500_df, monthly_rates_df)
+    monthly_returns_df = winsorize_cross_section(monthly_returns_df, winsorize_limits)
+    if estimator == 'correlation' and shrinkage == 'vasicek':
+        beta_df = calculate_shrinkage_beta(monthly_returns_df, monthly_sp500_df, monthly_rates_df)
+    else:
+        beta_df = calculate_beta(monthly_returns_df, monthly_sp500_df, monthly_rates_df, estimator, shrinkage)
     save_beta_to_csv(beta_df, output_file)
 
-path = os.getcwd()
-main(
-    rates_file=f'{path}/US Data/tbillrate_daily.csv',
-    sp500_file=f'{path}/US Data/SP500_rets_2003_2024.csv',
-    returns_file=f'{path}/US Data/CRSP_monthly_master_thesis_Kim.csv',
-    output_file=f'{path}/USResults/us_beta_values.csv'
-)
+def default_config(path):
+    """The thesis run's inputs and settings, relative to the repository root."""
+    return dict(
+        rates_file=f'{path}/US Data/tbillrate_daily.csv',
+        sp500_file=f'{path}/US Data/SP500_rets_2003_2024.csv',
+        returns_file=f'{path}/US Data/CRSP_monthly_master_thesis_Kim.csv',
+        delisting_file=None,  # CRSP delisting returns (permno, dlstdt, dlret); None uses ret alone
+        output_file=f'{path}/USResults/us_beta_values.csv',
+        out_of_core=True,  # chunked, checkpointed correlation/vasicek run that resumes after an interruption
+        store_dir=f'{path}/USResults/returns_store',
+        check_store=False,  # compare the store with the in-memory panel once built; loads the whole panel
+        estimator='correlation',  # 'correlation', 'ols', 'dimson' or 'ewma'; the others always run in memory
+        shrinkage='vasicek',  # 'vasicek' (constant 0.6) or 'bayesian'
+        winsorize_limits=(0.01, 0.99)  # per-month cross-sectional percentiles; None to skip
+    )
+
+if __name__ == "__main__":
+    main(**default_config(os.getcwd()))
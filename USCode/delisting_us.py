@@ -0,0 +1,78 @@
+import pandas as pd
+import numpy as np
+
+
+def month_codes(dates):
+    """Integer month of every date (year * 12 + month - 1), the date part of the merge key."""
+    dates = pd.DatetimeIndex(dates)
+    return dates.year.to_numpy(dtype=np.int64) * 12 + dates.month.to_numpy(dtype=np.int64) - 1
+
+
+def merge_keys(permnos, dates):
+    """One int64 key per (permno, month); months stay below 2**20, so keys never collide."""
+    return np.asarray(permnos, dtype=np.int64) << 20 | month_codes(dates)
+
+
+def load_delisting_returns(delisting_file, performance_dlret=None):
+    """CRSP delisting returns (permno, dlstdt, dlret[, dlstcd]) keyed to the delisting month.
+
+    dlret letter codes read as missing. performance_dlret optionally fills missing returns of
+    performance-related delistings (codes 500-599), e.g. -0.3 after Shumway (1997).
+    """
+    delisting_df = pd.read_csv(delisting_file)
+    delisting_df['dlstdt'] = pd.to_datetime(delisting_df['dlstdt'], format='%d%b%Y', errors='coerce')
+    delisting_df['dlret'] = pd.to_numeric(delisting_df['dlret'], errors='coerce')
+    if performance_dlret is not None and 'dlstcd' in delisting_df.columns:
+        performance = delisting_df['dlstcd'].between(500, 599) & delisting_df['dlret'].isna()
+        delisting_df.loc[performance, 'dlret'] = performance_dlret
+
+    delisting_df = delisting_df.dropna(subset=['permno', 'dlstdt', 'dlret'])
+    # A permno delists once; keep the last record if the file repeats it
+    delisting_df = delisting_df.drop_duplicates('permno', keep='last')
+    return delisting_df[['permno', 'dlstdt', 'dlret']].reset_index(drop=True)
+
+
+def compound_delisting(ret, dlret):
+    """(1 + ret)(1 + dlret) - 1 where both exist, otherwise whichever one exists."""
+    return np.where(np.isnan(ret), dlret, np.where(np.isnan(dlret), ret, (1 + ret) * (1 + dlret) - 1))
+
+
+def merge_delisting_returns(returns_df, delisting_df):
+    """Fold delisting returns into the long CRSP frame (permno, date, ret) before the pivot.
+
+    Both sides are reduced to integer (permno, month) keys; the delisting keys are sorted once
+    and every return row finds its match with one searchsorted. A matched row's ret is
+    compounded with dlret. A delisting of a stock in the frame whose month has no return row
+    for it becomes a new row dated like the panel's other rows of that month, so the stock's
+    final return is not lost; delistings of other stocks or months are dropped, as in the
+    out-of-core return store.
+    """
+    returns_df = returns_df.copy()
+    ret = pd.to_numeric(returns_df['ret'], errors='coerce').to_numpy(dtype=float)
+    keys = merge_keys(returns_df['permno'], returns_df['date'])
+    if delisting_df.empty:
+        returns_df['ret'] = ret
+        return returns_df
+
+    delisting_keys = merge_keys(delisting_df['permno'], delisting_df['dlstdt'])
+    order = np.argsort(delisting_keys, kind='stable')
+    delisting_keys = delisting_keys[order]
+    dlret = delisting_df['dlret'].to_numpy(dtype=float)[order]
+
+    position = np.minimum(np.searchsorted(delisting_keys, keys), len(delisting_keys) - 1)
+    matched = delisting_keys[position] == keys
+    returns_df['ret'] = compound_delisting(ret, np.where(matched, dlret[position], np.nan))
+
+    unmatched = np.ones(len(delisting_keys), dtype=bool)
+    unmatched[position[matched]] = False
+    # CRSP dates rows at the month's last trading day
+    month_dates = pd.Series(returns_df['date'].to_numpy()).groupby(keys & 0xFFFFF).max()
+    unmatched &= (np.isin(delisting_keys >> 20, returns_df['permno'].to_numpy(dtype=np.int64))
+                  & np.isin(delisting_keys & 0xFFFFF, month_dates.index))
+    if unmatched.any():
+        extra = delisting_df.iloc[order[unmatched]]
+        extra_df = pd.DataFrame({'permno': extra['permno'].to_numpy(),
+                                 'date': month_dates.reindex(month_codes(extra['dlstdt'])).to_numpy(),
+                                 'ret': dlret[unmatched]})
+        returns_df = pd.concat([returns_df, extra_df], ignore_index=True)
+    return returns_df
@@ -0,0 +1,127 @@
+import os
+import pandas as pd
+import numpy as np
+from universe_filters_us import pivot_characteristics
+from results_db_us import save_results_to_db, scenario_name
+
+
+def load_data(beta_file, returns_file, risk_free_file):
+    """Load the stock beta panel, the long CRSP frame and the monthly risk-free rate."""
+    beta_values_df = pd.read_csv(beta_file, index_col=0, parse_dates=True)
+    beta_values_df.index = beta_values_df.index + pd.offsets.MonthEnd(0)
+    crsp_df = pd.read_csv(returns_file)
+    crsp_df['date'] = pd.to_datetime(crsp_df['date'], format='%d%b%Y')
+    rf_rates_df = pd.read_csv(risk_free_file, parse_dates=['DATE']).set_index('DATE')
+    rf_rates_df = rf_rates_df.resample('ME').mean() / 100 / 12
+    return beta_values_df, crsp_df, rf_rates_df
+
+
+def prepare_panels(beta_values_df, crsp_df, rf_rates_df, start_date, end_date, years_to_remove):
+    """Align betas with next-month excess returns and the log market equity control."""
+    characteristics = pivot_characteristics(crsp_df, columns=('ret', 'prc', 'shrout'))
+    returns_df = characteristics['ret']
+    excess_returns_df = returns_df.sub(rf_rates_df['TB3MS'].reindex(returns_df.index), axis=0)
+
+    # Scripts list the years as strings ('2020') or ints; the index years are ints
+    years_to_remove = [int(year) for year in years_to_remove if year]
+    dates = beta_values_df.loc[start_date:end_date].index
+    dates = dates[~dates.year.isin(years_to_remove)]
+    columns = beta_values_df.columns
+
+    # Beta and size known at the end of month t explain the excess return of month t + 1; on the full
+    # month-end calendar, so a month missing from the return panel is missing, not the next one
+    next_excess_returns_df = excess_returns_df.asfreq('ME').shift(-1).reindex(index=dates, columns=columns)
+    controls = {}
+    if 'prc' in characteristics and 'shrout' in characteristics:
+        market_equity = characteristics['prc'].abs() * characteristics['shrout']
+        controls['log_ME'] = np.log(market_equity.where(market_equity > 0)).reindex(index=dates, columns=columns)
+
+    return beta_values_df.loc[dates], next_excess_returns_df, controls
+
+
+def fama_macbeth(beta_values_df, next_returns_df, controls=None, min_obs=30):
+    """Solve every monthly cross-section at once from masked normal equations.
+
+    Regresses next-month excess returns on a constant, the beta and the optional control panels
+    (all date x stock, same shape). Returns the monthly slope table and the number of stocks per month.
+    """
+    controls = controls or {}
+    names = ['const', 'beta'] + list(controls)
+    y = next_returns_df.to_numpy(dtype=float)
+    regressors = [np.ones_like(y), beta_values_df.to_numpy(dtype=float)]
+    regressors += [control.to_numpy(dtype=float) for control in controls.values()]
+
+    mask = np.isfinite(y)
+    for x in regressors:
+        mask &= np.isfinite(x)
+    y = np.where(mask, y, 0.0)
+    regressors = [np.where(mask, x, 0.0) for x in regressors]
+
+    k = len(regressors)
+    xtx = np.empty((len(y), k, k))
+    xty = np.empty((len(y), k))
+    for i in range(k):
+        xty[:, i] = (regressors[i] * y).sum(axis=1)
+        for j in range(i, k):
+            xtx[:, i, j] = xtx[:, j, i] = (regressors[i] * regressors[j]).sum(axis=1)
+
+    num_obs = mask.sum(axis=1)
+    valid = (num_obs >= max(min_obs, k + 1)) & (np.abs(np.linalg.det(xtx)) > 0)
+    gammas = np.full((len(y), k), np.nan)
+    gammas[valid] = np.linalg.solve(xtx[valid], xty[valid][:, :, None])[:, :, 0]
+
+    # Cross-sectional R² per month
+    fitted = sum(np.nan_to_num(gammas[:, [i]]) * regressors[i] for i in range(k))
+    y_mean = np.divide(y.sum(axis=1), num_obs, out=np.zeros(len(y)), where=num_obs > 0)
+    ss_res = (np.where(mask, y - fitted, 0.0) ** 2).sum(axis=1)
+    ss_tot = (np.where(mask, y - y_mean[:, None], 0.0) ** 2).sum(axis=1)
+    r_squared = np.where(valid, 1 - ss_res / np.where(ss_tot > 0, ss_tot, np.nan), np.nan)
+
+    gammas_df = pd.DataFrame(gammas, index=beta_values_df.index, columns=names)
+    gammas_df['R²'] = r_squared
+    gammas_df['N'] = num_obs
+    return gammas_df
+
+
+def summarize_fama_macbeth(gammas_df):
+    """Time-series averages of the monthly slopes with Fama-MacBeth t-statistics."""
+    slopes = gammas_df.drop(columns=['R²', 'N']).dropna()
+    summary = pd.DataFrame({
+        "Coefficient": slopes.mean(),
+        "t-stat": slopes.mean() / (slopes.std() / np.sqrt(len(slopes))),
+    })
+    summary.index.name = "Regressor"
+    summary["Average R²"] = gammas_df['R²'].mean()
+    summary["Average N"] = gammas_df.loc[slopes.index, 'N'].mean()
+    summary["Months"] = len(slopes)
+    return summary.reset_index()
+
+
+def main():
+    path = os.getcwd()
+    BETA_FILE = f"{path}/USResults/us_beta_values.csv"
+    RETURNS_FILE = f"{path}/US Data/CRSP_monthly_master_thesis_Kim.csv"
+    RISK_FREE_FILE = f"{path}/US Data/tbillrate_daily.csv"
+    OUTPUT_FILE = f"{path}/USResults/fama_macbeth_us.csv"
+    RESULTS_DB = f"{path}/results.sqlite"
+
+    start_date, end_date = '2003-01-01', '2023-12-31'
+    years_to_remove = []
+    use_size_control = True
+
+    beta_values_df, crsp_df, rf_rates_df = load_data(BETA_FILE, RETURNS_FILE, RISK_FREE_FILE)
+    beta_values_df, next_excess_returns_df, controls = prepare_panels(
+        beta_values_df, crsp_df, rf_rates_df, start_date, end_date, years_to_remove)
+
+    gammas_df = fama_macbeth(beta_values_df, next_excess_returns_df, controls if use_size_control else None)
+    summary_df = summarize_fama_macbeth(gammas_df)
+
+    print(summary_df.to_string(index=False))
+    summary_df.to_csv(OUTPUT_FILE, index=False)
+    save_results_to_db(RESULTS_DB, summary_df, 1, scenario_name(years_to_remove), "fama_macbeth",
+                       {"start_date": start_date, "end_date": end_date, "size_control": use_size_control},
+                       portfolio_col="Regressor")
+
+
+if __name__ == "__main__":
+    main()
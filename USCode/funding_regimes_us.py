@@ -0,0 +1,166 @@
+import os
+import pandas as pd
+import numpy as np
+from prop3_us import load_data, compute_ted_spread
+from results_db_us import save_results_to_db, scenario_name
+
+
+def regime_masks(ted_spread, num_buckets=(3, 5), spike_quantile=0.9, episode_months=3):
+    """Every funding regime as one row of a boolean regime x month matrix.
+
+    Splits are full-sample quantile buckets of the TED spread level (terciles and quintiles by
+    default) and spike episodes: a month whose TED change is above its spike_quantile starts an
+    episode covering it and the following episode_months - 1 months; the rest is 'calm'.
+    Returns the (Split, Regime) labels and the matrix over ted_spread's index.
+    """
+    level = ted_spread['TED_Spread'].to_numpy()
+    change = ted_spread['Delta_TED'].to_numpy()
+    labels, masks = [], []
+
+    ranks = pd.Series(level).rank(pct=True).to_numpy()
+    for buckets in num_buckets:
+        bucket = np.minimum(np.ceil(ranks * buckets), buckets)
+        for b in range(1, buckets + 1):
+            labels.append((f"TED {buckets}-tile", f"Q{b}"))
+            masks.append(bucket == b)
+
+    spikes = change > np.nanquantile(change, spike_quantile)
+    episode = pd.Series(spikes).rolling(episode_months, min_periods=1).max().to_numpy().astype(bool)
+    labels += [("TED spike", "Episode"), ("TED spike", "Calm")]
+    masks += [episode, ~episode & np.isfinite(change)]
+
+    return pd.DataFrame(labels, columns=["Split", "Regime"]), np.array(masks)
+
+
+def regime_performance(r_bab, labels, masks):
+    """Mean, volatility, Sharpe ratio and t-statistic of the BAB return within every regime at once."""
+    returns = np.asarray(r_bab, dtype=float)
+    weights = masks & np.isfinite(returns)[None, :]
+    returns = np.where(np.isfinite(returns), returns, 0.0)
+
+    months = weights.sum(axis=1)
+    mean = weights @ returns / months
+    variance = (weights @ returns ** 2 - months * mean ** 2) / (months - 1)
+    volatility = np.sqrt(variance)
+
+    performance = labels.copy()
+    performance["Months"] = months
+    performance["Mean Return"] = mean
+    performance["Volatility"] = volatility * np.sqrt(12)
+    performance["Sharpe Ratio"] = mean / volatility * np.sqrt(12)
+    performance["t-Statistic"] = mean / (volatility / np.sqrt(months))
+    return performance
+
+
+def batched_ols(y, designs):
+    """OLS of y on every design in a specs x months x terms stack, each over its own complete months.
+
+    Returns coefficients, t-statistics (homoskedastic, like statsmodels' OLS), R-squared and months.
+    A specification with no more months than terms or a rank-deficient design (e.g. a regime
+    dummy that is constant over its months) gets NaN results, like query_stats.
+    """
+    weights = (np.isfinite(designs).all(axis=2) & np.isfinite(y)[None, :]).astype(float)
+    designs = np.where(weights[:, :, None] > 0, designs, 0.0)
+    y = np.where(np.isfinite(y), y, 0.0)
+
+    xtx = np.einsum('st,stk,stl->skl', weights, designs, designs)
+    xty = np.einsum('st,stk,t->sk', weights, designs, y)
+    months = weights.sum(axis=1)
+    y_sum, y_squares = weights @ y, weights @ y ** 2
+
+    num_terms = designs.shape[2]
+    valid = (months > num_terms) & (np.linalg.matrix_rank(xtx) == num_terms)
+    # Invert the identity in place of an unusable design, so one bad specification cannot fail the batch
+    xtx_inv = np.linalg.inv(np.where(valid[:, None, None], xtx, np.eye(num_terms)))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        coefficients = np.einsum('skl,sl->sk', xtx_inv, xty)
+        residual_ss = y_squares - np.einsum('sk,sk->s', coefficients, xty)
+        sigma2 = residual_ss / (months - num_terms)
+        standard_errors = np.sqrt(np.diagonal(xtx_inv, axis1=1, axis2=2) * sigma2[:, None])
+        t_statistics = coefficients / standard_errors
+        r_squared = 1 - residual_ss / (y_squares - y_sum ** 2 / months)
+    return (np.where(valid[:, None], coefficients, np.nan), np.where(valid[:, None], t_statistics, np.nan),
+            np.where(valid, r_squared, np.nan), months)
+
+
+def lagged_regressions(r_bab, ted_spread, labels, masks, lags=(0, 1, 3, 6, 12)):
+    """BAB on lagged TED level and change, alone and interacted with every regime indicator.
+
+    For each lag h the base specification is r_BAB(t) = a + b TED(t-h) + c dTED(t-h); the
+    interaction specifications add the regime dummy D(t-h) and D(t-h) * dTED(t-h). All lags and
+    regimes are stacked into two design tensors and solved in one batch each. Lag 0 without
+    interaction is prop3's run_funding_regression.
+    """
+    level = ted_spread['TED_Spread'].to_numpy()
+    change = ted_spread['Delta_TED'].to_numpy()
+    y = np.asarray(r_bab, dtype=float)
+    ones = np.ones(len(y))
+
+    def lag(values, h):
+        return np.r_[np.full(h, np.nan), values[:len(values) - h]]
+
+    # Regime dummies are undefined where the regime itself is (e.g. the first TED change)
+    dummies = np.where(np.isfinite(level) & np.isfinite(change), masks, np.nan)
+
+    base = np.array([np.column_stack([ones, lag(level, h), lag(change, h)]) for h in lags])
+    interacted = np.array([np.column_stack([ones, lag(level, h), lag(change, h), lag(dummy, h),
+                                            lag(dummy * change, h)])
+                           for h in lags for dummy in dummies])
+
+    regimes = [f"{split} {regime}" for split, regime in labels.itertuples(index=False)]
+    batches = [
+        ([(h, "None") for h in lags], ["const", "TED_Spread", "Delta_TED"], base),
+        ([(h, regime) for h in lags for regime in regimes],
+         ["const", "TED_Spread", "Delta_TED", "Regime", "Regime x Delta_TED"], interacted),
+    ]
+
+    rows = []
+    for specs, terms, designs in batches:
+        coefficients, t_statistics, r_squared, months = batched_ols(y, designs)
+        for s, (h, regime) in enumerate(specs):
+            for k, term in enumerate(terms):
+                rows.append({"Lag": h, "Interaction": regime, "Term": term,
+                             "Coefficient": coefficients[s, k], "t-Statistic": t_statistics[s, k],
+                             "R-squared": r_squared[s], "Months": int(months[s])})
+    return pd.DataFrame(rows)
+
+
+def run_funding_regimes(bab_factor, ted_spread, lags=(0, 1, 3, 6, 12)):
+    """Regime performance and lagged regressions of the BAB factor on one TED series."""
+    # Full TED calendar, so lags reach back before the first BAB month
+    data = ted_spread[['TED_Spread', 'Delta_TED']].join(bab_factor['r_BAB'], how='left')
+    labels, masks = regime_masks(data)
+    performance = regime_performance(data['r_BAB'], labels, masks)
+    regressions = lagged_regressions(data['r_BAB'], data, labels, masks, lags)
+    return performance, regressions
+
+
+def main():
+    path = os.getcwd()
+    results_db = f"{path}/results.sqlite"
+    output_dir = f"{path}/USResults/Prop3"
+    lags = (0, 1, 3, 6, 12)
+
+    # The spliced EDRate/SOFR TED series is built once and shared by every split and lag
+    bab_factor, edrate, sofr, tbill = load_data(path)
+    ted_spread = compute_ted_spread(edrate, sofr, tbill)
+    performance, regressions = run_funding_regimes(bab_factor, ted_spread, lags)
+
+    print(performance.to_string(index=False))
+    print(regressions[regressions["Term"].isin(["Delta_TED", "Regime x Delta_TED"])].to_string(index=False))
+
+    os.makedirs(output_dir, exist_ok=True)
+    performance.to_csv(f"{output_dir}/funding_regimes_us.csv", index=False)
+    regressions.to_csv(f"{output_dir}/funding_regressions_us.csv", index=False)
+
+    performance["Regime"] = performance["Split"] + " " + performance["Regime"]
+    regressions["Specification"] = ("lag " + regressions["Lag"].astype(str) + " " + regressions["Interaction"]
+                                    + " " + regressions["Term"])
+    save_results_to_db(results_db, performance.drop(columns="Split"), 3, scenario_name([]), "funding_regimes",
+                       portfolio_col="Regime")
+    save_results_to_db(results_db, regressions.drop(columns=["Lag", "Interaction", "Term"]), 3, scenario_name([]),
+                       "funding_regressions", {"lags": list(lags)}, portfolio_col="Specification")
+
+
+if __name__ == "__main__":
+    main()
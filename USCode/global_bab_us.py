@@ -0,0 +1,109 @@
+import os
+import pandas as pd
+import numpy as np
+from results_db_us import save_results_to_db, scenario_name
+from prop2_us import load_data, filter_technology_firms, preprocess_data, calculate_bab_factor
+
+
+def load_fx_returns(fx_file, start_date, end_date):
+    """Monthly return of one unit of local currency in US dollars from a Date, Rate (USD per unit) file."""
+    fx_df = pd.read_csv(fx_file, index_col='Date', parse_dates=True)
+    rate = pd.to_numeric(fx_df['Rate'], errors='coerce').resample('ME').last()
+    return rate.pct_change().loc[start_date:end_date]
+
+
+def stack_country_panels(panels, fx_returns=None):
+    """Stack per-country (betas, returns) panels side by side on one monthly calendar.
+
+    panels maps a country code to month-end beta and decimal return frames in local currency;
+    fx_returns optionally maps a code to its monthly currency return against the dollar, so
+    (1 + r) (1 + fx) - 1 is the dollar return. Columns become 'CODE:stock' and stay grouped
+    by country, so each market is one contiguous column block and adding a market only adds
+    its own block. Returns the stacked betas and returns and the country code of every column.
+    """
+    fx_returns = fx_returns or {}
+    dates = pd.DatetimeIndex(sorted(set().union(*(betas.index for betas, _ in panels.values()))), name="Date")
+
+    betas_blocks, returns_blocks, countries = [], [], []
+    for country, (betas, returns) in panels.items():
+        columns = betas.columns.intersection(returns.columns)
+        betas = betas.reindex(index=dates, columns=columns)
+        returns = returns.reindex(index=dates, columns=columns)
+        if country in fx_returns:
+            fx = fx_returns[country].reindex(dates).to_numpy()[:, None]
+            returns = (1 + returns) * (1 + fx) - 1
+
+        labels = [f"{country}:{stock}" for stock in columns]
+        betas_blocks.append(betas.set_axis(labels, axis=1))
+        returns_blocks.append(returns.set_axis(labels, axis=1))
+        countries.append(np.full(len(columns), country))
+
+    return pd.concat(betas_blocks, axis=1), pd.concat(returns_blocks, axis=1), np.concatenate(countries)
+
+
+def calculate_global_bab_factors(beta_values_df, returns_df, countries, min_stocks=2):
+    """Pooled, country-neutral and per-country BAB factors from one stacked panel.
+
+    Each factor uses calculate_bab_factor's rank weights and leverage. The pooled factor ranks
+    all stocks of a month against each other; the country factors rank within one column
+    block and the country-neutral factor equally weights the countries with at least
+    min_stocks betas that month, so no market's beta level drives the global spread.
+    """
+    factors = {"Pooled": calculate_bab_factor(beta_values_df, returns_df)[0]}
+
+    for country in dict.fromkeys(countries):
+        block = countries == country
+        country_bab = calculate_bab_factor(beta_values_df.loc[:, block], returns_df.loc[:, block])[0]
+        enough = beta_values_df.loc[:, block].notna().sum(axis=1) >= min_stocks
+        factors[country] = country_bab.where(enough)
+
+    country_factors = pd.DataFrame({country: factors[country] for country in dict.fromkeys(countries)})
+    factors["Country Neutral"] = country_factors.mean(axis=1)
+
+    return pd.DataFrame(factors)[["Pooled", "Country Neutral", *country_factors.columns]]
+
+
+def load_de_panel(beta_file, returns_file, start_date, end_date):
+    """German betas and returns on month ends; the return file is in percent."""
+    beta_values_df = pd.read_csv(beta_file, index_col='Date', parse_dates=True).resample('ME').last()
+    returns_df = pd.read_csv(returns_file, delimiter=';', index_col='Date', parse_dates=True).resample('ME').last()
+    return beta_values_df.loc[start_date:end_date], returns_df.loc[start_date:end_date] / 100
+
+
+def main():
+    path = os.getcwd()
+    US_BETA_FILE = f"{path}/USResults/us_beta_values.csv"
+    US_RETURNS_FILE = f"{path}/US Data/CRSP_monthly_master_thesis_Kim.csv"
+    RISK_FREE_FILE = f"{path}/US Data/tbillrate_daily.csv"
+    MKT_RETURNS_FILE = f"{path}/US Data/SP500_rets_2003_2024.csv"
+    DE_BETA_FILE = f"{path}/DEResults/de_beta_values.csv"
+    DE_RETURNS_FILE = f"{path}/German data/DE_total_return_01-2024.csv"
+    FX_FILE = f"{path}/German data/EURUSD.csv"  # Date, Rate in USD per EUR; None keeps local currencies
+    OUTPUT_FILE = f"{path}/USResults/Prop2/bab_factor_global.csv"
+    RESULTS_DB = f"{path}/results.sqlite"
+
+    start_date, end_date = '2003-01-01', '2023-12-31'
+    min_stocks = 2
+
+    beta_values_df, returns_df, rf_rates_df, market_returns_df = load_data(US_BETA_FILE, US_RETURNS_FILE,
+                                                                           RISK_FREE_FILE, MKT_RETURNS_FILE)
+    returns_df = filter_technology_firms(returns_df)
+    us_betas_df, us_returns_df, _, _ = preprocess_data(beta_values_df, returns_df, rf_rates_df, market_returns_df,
+                                                       start_date, end_date)
+    de_betas_df, de_returns_df = load_de_panel(DE_BETA_FILE, DE_RETURNS_FILE, start_date, end_date)
+
+    fx_returns = {"DE": load_fx_returns(FX_FILE, start_date, end_date)} if FX_FILE else None
+    beta_values_df, returns_df, countries = stack_country_panels(
+        {"US": (us_betas_df, us_returns_df), "DE": (de_betas_df, de_returns_df)}, fx_returns)
+    global_bab = calculate_global_bab_factors(beta_values_df, returns_df, countries, min_stocks)
+
+    print(global_bab.resample('Y').sum())
+    global_bab.to_csv(OUTPUT_FILE)
+    save_results_to_db(RESULTS_DB, global_bab, 2, scenario_name([]), "global_bab",
+                       {"start_date": start_date, "end_date": end_date, "countries": list(dict.fromkeys(countries)),
+                        "currency": "USD" if FX_FILE else "local", "min_stocks": min_stocks})
+    print("Global BAB factors saved to", OUTPUT_FILE)
+
+
+if __name__ == "__main__":
+    main()
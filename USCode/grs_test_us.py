@@ -0,0 +1,87 @@
+import pandas as pd
+import numpy as np
+from jackknife_us import FACTOR_MODELS
+from results_db_us import save_results_to_db
+
+
+def batched_solve(matrices, rhs):
+    """np.linalg.solve over a stack of systems, NaN for the singular or non-finite ones.
+
+    One rank-deficient scenario would otherwise raise LinAlgError for the whole stack; its
+    matrix is swapped for the identity before the solve and its solution blanked afterwards.
+    """
+    finite = np.isfinite(matrices).all(axis=(-2, -1)) & np.isfinite(rhs).all(axis=(-2, -1))
+    size = matrices.shape[-1]
+    solvable = finite & (np.linalg.matrix_rank(np.where(finite[:, None, None], matrices, 0.0)) == size)
+    solution = np.linalg.solve(np.where(solvable[:, None, None], matrices, np.eye(size)),
+                               np.where(solvable[:, None, None], rhs, 0.0))
+    return np.where(solvable[:, None, None], solution, np.nan)
+
+
+def grs_test(excess_returns, factors, masks, factor_columns, models=FACTOR_MODELS):
+    """Gibbons-Ross-Shanken test of all portfolio alphas being zero, per scenario and factor model.
+
+    excess_returns is a months x portfolios array, factors a months x K array over the same
+    calendar and masks maps a scenario name to a boolean month vector. Months missing any
+    portfolio or factor are dropped, as the test needs a balanced panel. The moments of the
+    shared design [1, factors] and the returns are formed once for every scenario; each model
+    is a sub-block of them, so the whole scenario x model grid is a few batched solves.
+
+    GRS = (T - N - L) / N * a' Σ⁻¹ a / (1 + μ' Ω⁻¹ μ) ~ F(N, T - N - L), with the maximum
+    likelihood residual covariance Σ and factor covariance Ω (Cochrane, Asset Pricing, 12.1).
+    Scenarios with T - N - L <= 0 or a singular design or covariance get a NaN row.
+    """
+    from scipy.stats import f
+
+    complete = np.isfinite(excess_returns).all(axis=1) & np.isfinite(factors).all(axis=1)
+    design = np.column_stack([np.ones(len(factors)), factors])
+    design = np.where(complete[:, None], design, 0.0)
+    returns = np.where(complete[:, None], excess_returns, 0.0)
+
+    scenarios = list(masks)
+    weights = np.array([masks[scenario] & complete for scenario in scenarios], dtype=float)
+    ztz = np.einsum('st,ta,tb->sab', weights, design, design)
+    zty = np.einsum('st,ta,ti->sai', weights, design, returns)
+    yty = np.einsum('st,ti,tj->sij', weights, returns, returns)
+    n = weights.sum(axis=1)
+    num_portfolios = returns.shape[1]
+
+    rows = []
+    for model, model_factors in models.items():
+        if not set(model_factors) <= set(factor_columns):
+            continue
+        columns = [0] + [1 + factor_columns.index(factor) for factor in model_factors]
+        num_factors = len(model_factors)
+        xtx = ztz[:, columns][:, :, columns]
+        xty = zty[:, columns]
+
+        dof = n - num_portfolios - num_factors
+        with np.errstate(invalid='ignore', divide='ignore'):
+            coefficients = batched_solve(xtx, xty)
+            alpha = coefficients[:, 0]
+            residual_covariance = (yty - np.einsum('sai,saj->sij', coefficients, xty)) / n[:, None, None]
+            factor_mean = xtx[:, 0, 1:] / n[:, None]
+            factor_covariance = xtx[:, 1:, 1:] / n[:, None, None] - factor_mean[:, :, None] * factor_mean[:, None, :]
+
+        alpha_quadratic = np.einsum('si,si->s', alpha, batched_solve(residual_covariance, alpha[..., None])[..., 0])
+        sharpe_quadratic = np.einsum('sa,sa->s', factor_mean,
+                                     batched_solve(factor_covariance, factor_mean[..., None])[..., 0])
+        statistic = np.where(dof > 0, dof / num_portfolios * alpha_quadratic / (1 + sharpe_quadratic), np.nan)
+
+        rows.append(pd.DataFrame({
+            "Scenario": scenarios,
+            "Model": model,
+            "GRS": statistic,
+            "p-value": f.sf(statistic, num_portfolios, np.maximum(dof, 1)),
+            "Mean |Alpha|": np.abs(alpha).mean(axis=1),
+            "Months": n.astype(int),
+            "Portfolios": num_portfolios,
+        }))
+    return pd.concat(rows, ignore_index=True)
+
+
+def save_grs_to_db(db_file, grs_df, proposition, params=None):
+    """One 'grs_test' table per scenario with a row per factor model."""
+    for scenario, scenario_df in grs_df.groupby("Scenario", sort=False):
+        save_results_to_db(db_file, scenario_df.drop(columns="Scenario"), proposition, scenario, "grs_test", params,
+                           portfolio_col="Model")
@@ -0,0 +1,187 @@
+import os
+import pandas as pd
+import numpy as np
+from results_db_us import save_results_to_db, scenario_name
+from data_loader_us import load_sources
+
+
+def rolling_factor_covariance(returns_df, factors_df, window=60, min_periods=36, shrinkage_factor=0.6):
+    """Yield (date, stocks, loadings, factor covariance, idiosyncratic variances) at every month end.
+
+    The covariance is never formed: it is Σ = B F B' + diag(D) with N x K loadings B, a K x K
+    factor covariance F and N idiosyncratic variances D. Each month the regression sums of every
+    stock are updated by adding the new month and subtracting the one that leaves the window,
+    so the state is N·(K+1)² numbers and no month is revisited. Loadings get the thesis'
+    Vasicek shrinkage toward their cross-sectional mean.
+    """
+    factors_df = factors_df.reindex(returns_df.index)
+    returns = returns_df.to_numpy(dtype=float)
+    design = np.column_stack([np.ones(len(factors_df)), factors_df.to_numpy(dtype=float)])
+    factors_valid = np.isfinite(design).all(axis=1)
+    num_stocks, k = returns.shape[1], design.shape[1]
+
+    n = np.zeros(num_stocks)
+    zz = np.zeros((num_stocks, k, k))
+    zy = np.zeros((num_stocks, k))
+    yy = np.zeros(num_stocks)
+
+    def update(t, sign):
+        if not factors_valid[t]:
+            return
+        valid = np.isfinite(returns[t])
+        y = np.where(valid, returns[t], 0.0)
+        w = valid.astype(float)
+        n[:] += sign * w
+        zz[:] += sign * w[:, None, None] * np.outer(design[t], design[t])
+        zy[:] += sign * y[:, None] * design[t]
+        yy[:] += sign * y ** 2
+
+    for t, date in enumerate(returns_df.index):
+        update(t, 1)
+        if t >= window:
+            update(t - window, -1)
+
+        window_rows = slice(max(0, t - window + 1), t + 1)
+        window_factors = design[window_rows, 1:][factors_valid[window_rows]]
+        if len(window_factors) < min_periods:
+            continue
+
+        # Only stocks with a full enough history and a return this month can be held next month
+        stocks = np.flatnonzero((n >= max(min_periods, k + 1)) & np.isfinite(returns[t]))
+        if len(stocks) <= k:
+            continue
+        coefficients = np.linalg.solve(zz[stocks], zy[stocks][..., None])[..., 0]
+        residual_variance = (yy[stocks] - np.einsum('ia,ia->i', coefficients, zy[stocks])) / (n[stocks] - k)
+
+        loadings = coefficients[:, 1:]
+        loadings = shrinkage_factor * loadings + (1 - shrinkage_factor) * loadings.mean(axis=0)
+        factor_covariance = np.atleast_2d(np.cov(window_factors, rowvar=False))
+        # Floor the idiosyncratic variances so that no stock looks riskless
+        idiosyncratic_variance = np.maximum(residual_variance, np.nanmedian(residual_variance) * 0.1)
+        yield date, stocks, loadings, factor_covariance, idiosyncratic_variance
+
+
+def covariance_times(loadings, factor_covariance, idiosyncratic_variance, weights):
+    """Σw in O(N·K) without forming Σ."""
+    return loadings @ (factor_covariance @ (loadings.T @ weights)) + idiosyncratic_variance * weights
+
+
+def minimum_variance_weights(loadings, factor_covariance, idiosyncratic_variance, long_only=True, max_iter=50):
+    """Fully invested minimum-variance weights through the Woodbury identity.
+
+    Σ⁻¹1 = D⁻¹1 - D⁻¹B (F⁻¹ + B'D⁻¹B)⁻¹ B'D⁻¹1 needs only a K x K inverse. With long_only the
+    names with negative weights are dropped and the rest re-solved until none is left short.
+    """
+    active = np.ones(len(idiosyncratic_variance), dtype=bool)
+    weights = np.zeros(len(idiosyncratic_variance))
+    for _ in range(max_iter):
+        b, d = loadings[active], idiosyncratic_variance[active]
+        d_inv_ones = 1 / d
+        d_inv_b = b / d[:, None]
+        core = np.linalg.inv(np.linalg.inv(factor_covariance) + b.T @ d_inv_b)
+        sigma_inv_ones = d_inv_ones - d_inv_b @ (core @ (b.T @ d_inv_ones))
+
+        weights[:] = 0.0
+        weights[active] = sigma_inv_ones / sigma_inv_ones.sum()
+        if not long_only or (weights >= 0).all():
+            break
+        active &= weights > 0
+    return weights
+
+
+def risk_parity_weights(loadings, factor_covariance, idiosyncratic_variance, tol=1e-10, max_iter=1000):
+    """Equal-risk-contribution weights from a Jacobi sweep of the cyclical coordinate descent of Griveau-Billion et al.
+
+    Every stock solves σᵢᵢyᵢ² + cᵢyᵢ - 1/N = 0 with cᵢ = (Σy)ᵢ - σᵢᵢyᵢ at once, so each sweep is
+    one O(N·K) covariance product.
+    """
+    num_stocks = len(idiosyncratic_variance)
+    budget = 1 / num_stocks
+    variances = np.einsum('ia,ab,ib->i', loadings, factor_covariance, loadings) + idiosyncratic_variance
+    y = 1 / np.sqrt(variances)
+    y /= np.sqrt(y @ covariance_times(loadings, factor_covariance, idiosyncratic_variance, y))
+
+    for _ in range(max_iter):
+        c = covariance_times(loadings, factor_covariance, idiosyncratic_variance, y) - variances * y
+        y_new = (-c + np.sqrt(c ** 2 + 4 * variances * budget)) / (2 * variances)
+        # Damping keeps the simultaneous update from oscillating
+        y_new = 0.5 * (y + y_new)
+        if np.abs(y_new - y).max() < tol * y.max():
+            y = y_new
+            break
+        y = y_new
+    return y / y.sum()
+
+
+def build_low_risk_portfolios(excess_returns_df, factors_df, window=60, min_periods=36, shrinkage_factor=0.6,
+                              long_only=True):
+    """Monthly minimum-variance and risk-parity portfolios formed at t and held over t + 1."""
+    returns = excess_returns_df.to_numpy(dtype=float)
+    position = {date: t for t, date in enumerate(excess_returns_df.index)}
+    rows = []
+    for date, stocks, loadings, factor_covariance, idiosyncratic_variance in rolling_factor_covariance(
+            excess_returns_df, factors_df, window, min_periods, shrinkage_factor):
+        t = position[date]
+        if t + 1 >= len(returns):
+            break
+        portfolios = {
+            "Minimum Variance": minimum_variance_weights(loadings, factor_covariance, idiosyncratic_variance,
+                                                         long_only),
+            "Risk Parity": risk_parity_weights(loadings, factor_covariance, idiosyncratic_variance),
+        }
+        # Stocks that drop out next month are held at a zero return, i.e. as cash
+        next_returns = np.nan_to_num(returns[t + 1, stocks])
+        row = {"Date": excess_returns_df.index[t + 1]}
+        for name, weights in portfolios.items():
+            row[f"Return_{name}"] = weights @ next_returns
+            row[f"Ex-Ante Volatility_{name}"] = np.sqrt(12 * weights @ covariance_times(
+                loadings, factor_covariance, idiosyncratic_variance, weights))
+        rows.append(row)
+    return pd.DataFrame(rows).set_index("Date")
+
+
+def main():
+    path = os.getcwd()
+    RETURNS_FILE = f"{path}/US Data/CRSP_monthly_master_thesis_Kim.csv"
+    RISK_FREE_FILE = f"{path}/US Data/tbillrate_daily.csv"
+    MKT_RETURNS_FILE = f"{path}/US Data/SP500_rets_2003_2024.csv"
+    FAMA_FRENCH_FILE = f"{path}/US Data/US_ff_Values.csv"
+    OUTPUT_FILE = f"{path}/USResults/Prop2/low_risk_portfolios_us.csv"
+    RESULTS_DB = f"{path}/results.sqlite"
+
+    start_date, end_date = '2003-01-01', '2023-12-31'
+    window, shrinkage_factor, long_only = 60, 0.6, True
+
+    frames = load_sources({
+        "returns": {"file": RETURNS_FILE, "index_col": "date", "date_format": "%d%b%Y"},
+        "risk_free": {"file": RISK_FREE_FILE, "index_col": "DATE"},
+        "sp500": {"file": MKT_RETURNS_FILE, "index_col": "Date", "date_format": "%m-%d-%y"},
+        "fama_french": {"file": FAMA_FRENCH_FILE, "index_col": "DATE"},
+    })
+    crsp_df = frames["returns"].reset_index()
+    crsp_df['ret'] = pd.to_numeric(crsp_df['ret'], errors='coerce')
+    returns_df = crsp_df.pivot_table(index='date', columns='permno', values='ret', aggfunc='last')
+    returns_df = returns_df.resample('ME').last().loc[start_date:end_date]
+    risk_free = (frames["risk_free"]["TB3MS"].resample('ME').last() / 100 / 12).reindex(returns_df.index)
+
+    factors_df = pd.DataFrame({"MKT": pd.to_numeric(frames["sp500"]["Return"], errors='coerce').resample('ME').last()})
+    factors_df["MKT"] = factors_df["MKT"].reindex(returns_df.index) - risk_free
+    fama_french_df = frames["fama_french"].resample('ME').last()
+    for factor in ["SMB", "HML", "UMD"]:
+        if factor in fama_french_df.columns:
+            factors_df[factor] = fama_french_df[factor]
+
+    excess_returns_df = returns_df.sub(risk_free, axis=0)
+    portfolios_df = build_low_risk_portfolios(excess_returns_df, factors_df.reindex(returns_df.index), window,
+                                              shrinkage_factor=shrinkage_factor, long_only=long_only)
+
+    returns_only = portfolios_df[[col for col in portfolios_df if col.startswith("Return_")]]
+    print((returns_only.mean() / returns_only.std() * np.sqrt(12)).rename("Sharpe Ratio").to_string())
+    portfolios_df.to_csv(OUTPUT_FILE)
+    save_results_to_db(RESULTS_DB, portfolios_df, 2, scenario_name([]), "low_risk_portfolios",
+                       {"start_date": start_date, "end_date": end_date, "window": window,
+                        "shrinkage_factor": shrinkage_factor, "long_only": long_only})
+
+
+if __name__ == "__main__":
+    main()
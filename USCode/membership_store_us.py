@@ -0,0 +1,95 @@
+import os
+import pandas as pd
+import numpy as np
+
+# Bucket code of a stock that is in no portfolio on a date
+NOT_HELD = -1
+
+
+def membership_matrix(portfolios, index, columns):
+    """Portfolio membership as an int8 date x stock matrix of portfolio labels, NOT_HELD elsewhere.
+
+    portfolios maps a portfolio label to either a dict of date -> member stocks (a new sort on
+    every date) or one list of stocks held on every date of index (a sort on the latest betas).
+    """
+    columns = pd.Index(columns).astype(str)
+    membership = np.full((len(index), len(columns)), NOT_HELD, dtype=np.int8)
+    for label, members in portfolios.items():
+        if isinstance(members, dict):
+            rows = index.get_indexer(list(members))
+            for row, stocks in zip(rows, members.values()):
+                cols = columns.get_indexer(pd.Index(stocks).astype(str))
+                membership[row, cols[cols >= 0]] = label
+        else:
+            cols = columns.get_indexer(pd.Index(members).astype(str))
+            membership[:, cols[cols >= 0]] = label
+    return membership
+
+
+def save_membership(store_dir, membership, dates, stocks):
+    """Write the matrix and its date and stock index as .npy files; the matrix is published last."""
+    os.makedirs(store_dir, exist_ok=True)
+    np.save(f'{store_dir}/dates.npy', pd.DatetimeIndex(dates).values)
+    np.save(f'{store_dir}/stocks.npy', np.asarray(stocks).astype(str))
+    with open(f'{store_dir}/membership.npy.tmp', 'wb') as f:
+        np.save(f, np.asarray(membership, dtype=np.int8))
+    os.replace(f'{store_dir}/membership.npy.tmp', f'{store_dir}/membership.npy')
+
+
+def load_membership(store_dir, mmap_mode='r'):
+    """The membership matrix (memory-mapped by default), its dates and its stocks."""
+    membership = np.load(f'{store_dir}/membership.npy', mmap_mode=mmap_mode)
+    dates = pd.DatetimeIndex(np.load(f'{store_dir}/dates.npy'), name="Date")
+    stocks = pd.Index(np.load(f'{store_dir}/stocks.npy'))
+    return membership, dates, stocks
+
+
+def stock_history(membership, dates, stocks, stock):
+    """Portfolio of one stock on every date, missing where it was not held."""
+    column = np.asarray(membership[:, stocks.get_loc(str(stock))])
+    return pd.Series(column, index=dates, name=str(stock)).where(column != NOT_HELD)
+
+
+def migration_matrix(membership, labels, step=1):
+    """Counts of stocks moving from portfolio i on date t to portfolio j on date t + step.
+
+    labels are the portfolio labels in order; 'Not Held' covers entries, exits and stocks
+    without a portfolio, so row sums are the portfolio sizes. Divide by the row sums for
+    transition probabilities.
+    """
+    # Lookup from bucket code + 1 (so NOT_HELD is 0) to state number, 'Not Held' being the last
+    states = np.asarray(labels, dtype=np.int64)
+    codes = np.full(states.max() + 2, len(states), dtype=np.int64)
+    codes[states + 1] = np.arange(len(states))
+    membership = np.asarray(membership, dtype=np.int64) + 1
+
+    num_states = len(states) + 1
+    before, after = codes[membership[:-step]], codes[membership[step:]]
+    counts = np.bincount((before * num_states + after).ravel(), minlength=num_states ** 2)
+
+    names = list(labels) + ["Not Held"]
+    return pd.DataFrame(counts.reshape(num_states, num_states), index=pd.Index(names, name="From"),
+                        columns=pd.Index(names, name="To"))
+
+
+def holding_periods(membership, labels):
+    """Number of spells and mean, median and maximum holding period (in dates) per portfolio.
+
+    A spell is a run of consecutive dates a stock stays in the same portfolio. Runs are found
+    for all stocks at once on the column-major flattened matrix; spells cut by the start or
+    end of the sample are counted with their observed length.
+    """
+    flat = np.asarray(membership).T.ravel()
+    num_dates = np.asarray(membership).shape[0]
+    starts = np.flatnonzero(np.r_[True, flat[1:] != flat[:-1]] | (np.arange(len(flat)) % num_dates == 0))
+    lengths = np.diff(np.r_[starts, len(flat)])
+    spell_labels = flat[starts]
+
+    rows = []
+    for label in labels:
+        spells = lengths[spell_labels == label]
+        rows.append({"Portfolio": label, "Spells": len(spells),
+                     "Mean Holding Period": spells.mean() if len(spells) else np.nan,
+                     "Median Holding Period": np.median(spells) if len(spells) else np.nan,
+                     "Max Holding Period": spells.max() if len(spells) else np.nan})
+    return pd.DataFrame(rows)
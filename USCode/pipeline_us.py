@@ -0,0 +1,56 @@
+import os
+import sys
+import argparse
+import importlib
+
+# Stage name -> module; modules are imported only when their stage runs, so statsmodels and
+# matplotlib are never loaded for stages that do not regress or plot
+STAGES = {
+    "betas": "betas_us",
+    "beta_forecast": "beta_forecast_us",
+    "prop1": "prop1_us",
+    "prop1_regression": "prop1_us_regression",
+    "prop2": "prop2_us",
+    "prop2_regression": "prop2_us_regression",
+    "global_bab": "global_bab_us",
+    "prop3": "prop3_us",
+    "funding_regimes": "funding_regimes_us",
+    "fama_macbeth": "fama_macbeth_us",
+    "low_risk": "low_risk_portfolios_us",
+    "performance": "performance_analytics_us",
+    "simulation": "simulation_us",
+}
+
+PIPELINE = ["betas", "prop1", "prop1_regression", "prop2", "prop2_regression", "prop3"]
+
+
+def run_stage(stage, root):
+    """Run one stage's main() against the repository at root."""
+    # The scripts resolve their inputs from the working directory
+    os.chdir(root)
+    module = importlib.import_module(STAGES[stage])
+    if hasattr(module, "default_config"):
+        module.main(**module.default_config(root))
+    else:
+        module.main()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run stages of the US BAB pipeline")
+    parser.add_argument("stages", nargs="+", choices=list(STAGES) + ["all"],
+                        help="stages to run in order; 'all' runs " + " -> ".join(PIPELINE))
+    parser.add_argument("--root", default=os.getcwd(), help="repository root holding 'US Data' and 'USResults'")
+    parser.add_argument("--no-plots", action="store_true", help="render figures off-screen instead of showing them")
+    args = parser.parse_args(argv)
+
+    if args.no_plots:
+        os.environ["MPLBACKEND"] = "Agg"
+    stages = [stage for name in args.stages for stage in (PIPELINE if name == "all" else [name])]
+    root = os.path.abspath(args.root)
+    for stage in stages:
+        print(f"== {stage} ==")
+        run_stage(stage, root)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
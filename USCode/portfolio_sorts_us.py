@@ -0,0 +1,69 @@
+import pandas as pd
+import numpy as np
+
+
+def row_buckets(values, num_buckets):
+    """Bucket every stock 0..num_buckets-1 by its position in its date's sorted cross-section.
+
+    Each row is split into num_buckets blocks of n // num_buckets stocks with the remainder going
+    to the top bucket, the same split as create_beta_sorted_portfolios. Missing values get -1.
+    """
+    valid = np.isfinite(values)
+    order = np.argsort(np.where(valid, values, np.inf), axis=1, kind='stable')
+    positions = np.empty_like(order)
+    np.put_along_axis(positions, order, np.arange(values.shape[1])[None, :], axis=1)
+
+    stocks_per_bucket = (valid.sum(axis=1) // num_buckets)[:, None]
+    buckets = np.where(stocks_per_bucket > 0,
+                       np.minimum(positions // np.maximum(stocks_per_bucket, 1), num_buckets - 1),
+                       num_buckets - 1)
+    return np.where(valid, buckets, -1)
+
+
+def assign_sort_buckets(key_dfs, num_buckets, conditional=True):
+    """Composite bucket IDs (date x stock, int16, -1 if unsorted) for a single or multi-key sort.
+
+    key_dfs are wide date x stock panels sorted on in order, e.g. [size_df, beta_df] with
+    num_buckets [3, 5] for size terciles x beta quintiles. Conditional sorts bucket each key
+    within the buckets of the previous keys, independent sorts bucket every key on its own.
+    The composite ID is bucket_1 * (n_2 * ... * n_k) + ... + bucket_k.
+    """
+    index, columns = key_dfs[0].index, key_dfs[0].columns
+    keys = [key_df.reindex(index=index, columns=columns).to_numpy(dtype=float) for key_df in key_dfs]
+
+    # Only stocks with every sort key available enter the sort
+    valid = np.logical_and.reduce([np.isfinite(key) for key in keys])
+    keys = [np.where(valid, key, np.nan) for key in keys]
+
+    composite = np.zeros(valid.shape, dtype=np.int64)
+    num_groups = 1
+    for key, n in zip(keys, num_buckets):
+        if conditional and num_groups > 1:
+            buckets = np.full(valid.shape, -1)
+            for group in range(num_groups):
+                in_group = composite == group
+                group_buckets = row_buckets(np.where(in_group, key, np.nan), n)
+                buckets = np.where(in_group, group_buckets, buckets)
+        else:
+            buckets = row_buckets(key, n)
+        composite = composite * n + buckets
+        num_groups *= n
+
+    composite = np.where(valid, composite, -1)
+    return pd.DataFrame(composite.astype(np.int16), index=index, columns=columns)
+
+
+def aggregate_buckets(bucket_df, values_df, num_ids):
+    """Equal-weighted mean of values_df over the members of every bucket ID, date by date."""
+    ids = bucket_df.to_numpy()
+    values = values_df.reindex(index=bucket_df.index, columns=bucket_df.columns).to_numpy(dtype=float)
+    finite = np.isfinite(values)
+
+    aggregated = np.full((len(ids), num_ids), np.nan)
+    for bucket in range(num_ids):
+        members = (ids == bucket) & finite
+        counts = members.sum(axis=1)
+        sums = np.where(members, values, 0.0).sum(axis=1)
+        np.divide(sums, counts, out=aggregated[:, bucket], where=counts > 0)
+
+    return pd.DataFrame(aggregated, index=bucket_df.index, columns=range(num_ids))
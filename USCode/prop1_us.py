@@ -1,13 +1,21 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import os
-
-def plot_sharpe_ratios(annual_sharpe_ratios):
+from results_db_us import save_results_to_db, scenario_name
+from portfolio_sorts_us import assign_sort_buckets, aggregate_buckets
+from winsorize_us import winsorize_cross_section
+from validation_us import validate_inputs
+from membership_store_us import membership_matrix, save_membership
+from delisting_us import load_delisting_returns, merge_delisting_returns
+
+def plot_sharpe_ratios(annual_sharpe_ratios, sort_mode='beta'):
+    import matplotlib.pyplot as plt
+    # Size x beta portfolios are numbered size bucket first, beta bucket second
+    sort = "Size x Beta" if sort_mode == 'size_beta' else "Beta-Sorted"
     plt.figure(figsize=(12, 6))
     annual_sharpe_ratios.plot(kind='bar')
-    plt.title('Annualized Sharpe Ratios for 10 Portfolios (United States)')
-    plt.xlabel('Portfolio')
+    plt.title(f'Annualized Sharpe Ratios for {len(annual_sharpe_ratios)} {sort} Portfolios (United States)')
+    plt.xlabel('Portfolio (size, then beta)' if sort_mode == 'size_beta' else 'Portfolio')
     plt.ylabel('Annualized Sharpe Ratio')
     plt.xticks(ticks=np.arange(len(annual_sharpe_ratios)), labels=np.arange(1, len(annual_sharpe_ratios) + 1), rotation=0)
     plt.grid(axis='y', linestyle='--', alpha=0.7)
@@ -28,10 +36,10 @@ def calculate_shrinkage_beta(monthly_sp500_df, crsp_df, shrinkage_factor=0.6):
     return beta_df.apply(lambda col: shrinkage_factor * col + (1 - shrinkage_factor) * beta_xs, axis=0)
 
 
-def load_and_process_data(path):
-    sp500_df = pd.read_csv(f"{path}US Data/SP500_rets_2003_2024.csv")
-    tbill_df = pd.read_csv(f"{path}US Data/tbillrate_daily.csv")
-    crsp_df = pd.read_csv(f"{path}US Data/CRSP_monthly_master_thesis_Kim.csv")
+def load_and_process_data(path, delisting_file=None):
+    sp500_df = pd.read_csv(f"{path}/US Data/SP500_rets_2003_2024.csv")
+    tbill_df = pd.read_csv(f"{path}/US Data/tbillrate_daily.csv")
+    crsp_df = pd.read_csv(f"{path}/US Data/CRSP_monthly_master_thesis_Kim.csv")
 
     sp500_df['Date'] = pd.to_datetime(sp500_df['Date'], format='%m-%d-%y')
     tbill_df['DATE'] = pd.to_datetime(tbill_df['DATE'], format='%Y-%m-%d')
@@ -40,15 +48,31 @@ def load_and_process_data(path):
     sp500_df.set_index('Date', inplace=True)
     tbill_df.set_index('DATE', inplace=True)
 
+    validate_inputs({
+        "crsp": {"frame": crsp_df, "unit": "decimal_return", "columns": ["ret"], "keys": ["permno", "date"],
+                 "date_col": "date"},
+        "sp500": {"frame": sp500_df, "unit": "decimal_return", "columns": ["Return"]},
+        "tbill": {"frame": tbill_df, "unit": "percent_rate", "columns": ["TB3MS"]},
+    }, '2003-01-01', '2023-12-31')
+
+    if delisting_file:
+        crsp_df = merge_delisting_returns(crsp_df, load_delisting_returns(delisting_file))
+
     sp500_monthly_df = sp500_df.resample('ME').mean()
     tbill_monthly_df = tbill_df.resample('ME').mean()
 
     crsp_pivot_df = crsp_df.pivot(index='date', columns='permno', values='ret')
 
+    # Market equity for size sorts (CRSP stores bid/ask midpoints as negative prices)
+    market_equity_df = None
+    if 'prc' in crsp_df.columns and 'shrout' in crsp_df.columns:
+        crsp_df['me'] = crsp_df['prc'].abs() * crsp_df['shrout']
+        market_equity_df = crsp_df.pivot(index='date', columns='permno', values='me')
+
     tbill_monthly_df['TB3MS'] = tbill_monthly_df['TB3MS'] / 100 / 12
     sp500_monthly_df['Excess Return'] = sp500_monthly_df['Return'] - tbill_monthly_df['TB3MS']
 
-    return sp500_monthly_df, tbill_monthly_df, crsp_pivot_df
+    return sp500_monthly_df, tbill_monthly_df, crsp_pivot_df, market_equity_df
 
 
 def filter_data(sp500_monthly_df, tbill_monthly_df, years_to_remove, start_date, end_date):
@@ -78,6 +102,15 @@ def calculate_portfolio_returns(crsp_df, shrinkage_betas, portfolio_dict):
     return portfolio_returns, portfolio_betas
 
 
+def form_double_sorted_portfolios(crsp_df, shrinkage_betas, market_equity_df, num_size=3, num_beta=5,
+                                  conditional=True):
+    # Size x beta sort per date; portfolio k is size bucket k // num_beta, beta bucket k % num_beta
+    bucket_df = assign_sort_buckets([market_equity_df, shrinkage_betas], [num_size, num_beta], conditional)
+    portfolio_returns = aggregate_buckets(bucket_df, crsp_df, num_size * num_beta)
+    portfolio_betas = aggregate_buckets(bucket_df, shrinkage_betas, num_size * num_beta)
+    return portfolio_returns, portfolio_betas
+
+
 def compute_annual_sharpe_ratios(portfolio_returns, tbill_monthly_df):
     excess_returns_df = portfolio_returns.sub(tbill_monthly_df['TB3MS'], axis=0)
     annualized_mean_excess_return = excess_returns_df.mean() * 12
@@ -85,34 +118,52 @@ def compute_annual_sharpe_ratios(portfolio_returns, tbill_monthly_df):
     return annualized_mean_excess_return / annualized_volatility
 
 
-def save_results(path, years_to_remove, portfolio_returns, portfolio_betas):
+def save_results(path, years_to_remove, portfolio_returns, portfolio_betas, db_file=None, params=None):
     monthly_results = pd.concat([portfolio_returns.add_prefix("Return_"), portfolio_betas.add_prefix("Beta_")], axis=1)
     monthly_results.index.name = "Date"
     monthly_results.to_csv(f"{path}/USResults/Prop1/portfolio_betas_returns_{years_to_remove[0]}.csv")
+    # Unsuffixed copy of the latest run, the file prop1_us_regression and the analytics read
+    monthly_results.to_csv(f"{path}/USResults/Prop1/portfolio_betas_returns.csv")
+    if db_file:
+        save_results_to_db(db_file, monthly_results, 1, scenario_name(years_to_remove), "portfolio_betas_returns", params)
 
 
 def main():
     path = os.getcwd()
     years_to_remove = ['2020']
     start_date, end_date = '2003-01-01', '2023-12-31'
+    results_db = f"{path}/results.sqlite"
+    sort_mode = 'beta'  # 'beta' (deciles on latest betas) or 'size_beta' (size terciles x beta quintiles)
+    winsorize_limits = (0.01, 0.99)  # per-month cross-sectional percentiles; None to skip
+    delisting_file = None  # CRSP delisting returns (permno, dlstdt, dlret); None uses ret alone
 
-    sp500_monthly_df, tbill_monthly_df, crsp_winsorized_df = load_and_process_data(path)
+    sp500_monthly_df, tbill_monthly_df, crsp_df, market_equity_df = load_and_process_data(path, delisting_file)
+    crsp_winsorized_df = winsorize_cross_section(crsp_df, winsorize_limits)
     sp500_monthly_df, tbill_monthly_df = filter_data(sp500_monthly_df, tbill_monthly_df, years_to_remove, start_date,
                                                      end_date)
 
     shrinkage_betas = calculate_shrinkage_beta(sp500_monthly_df, crsp_winsorized_df)
+    shrinkage_betas = winsorize_cross_section(shrinkage_betas, winsorize_limits)
     shrinkage_betas.fillna(method='ffill', inplace=True)
 
-    latest_betas = shrinkage_betas.iloc[-1]
-    portfolio_dict = form_portfolios(latest_betas)
-
-    portfolio_returns, portfolio_betas = calculate_portfolio_returns(crsp_winsorized_df, shrinkage_betas,
-                                                                     portfolio_dict)
+    if sort_mode == 'size_beta':
+        portfolio_returns, portfolio_betas = form_double_sorted_portfolios(crsp_winsorized_df, shrinkage_betas,
+                                                                           market_equity_df)
+    else:
+        latest_betas = shrinkage_betas.iloc[-1]
+        portfolio_dict = form_portfolios(latest_betas)
+
+        portfolio_returns, portfolio_betas = calculate_portfolio_returns(crsp_winsorized_df, shrinkage_betas,
+                                                                         portfolio_dict)
+        membership = membership_matrix(portfolio_dict, crsp_winsorized_df.index, crsp_winsorized_df.columns)
+        save_membership(f"{path}/USResults/Prop1/membership_{years_to_remove[0]}", membership,
+                        crsp_winsorized_df.index, crsp_winsorized_df.columns)
     annual_sharpe_ratios = compute_annual_sharpe_ratios(portfolio_returns, tbill_monthly_df)
 
     print(annual_sharpe_ratios)
-    plot_sharpe_ratios(annual_sharpe_ratios)
-    save_results(path, years_to_remove, portfolio_returns, portfolio_betas)
+    plot_sharpe_ratios(annual_sharpe_ratios, sort_mode)
+    save_results(path, years_to_remove, portfolio_returns, portfolio_betas, results_db,
+                 {"start_date": start_date, "end_date": end_date, "sort_mode": sort_mode})
 
 if __name__ == "__main__":
     main()
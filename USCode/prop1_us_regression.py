@@ -1,23 +1,11 @@
 import os
 import pandas as pd
 import numpy as np
-import statsmodels.api as sm
-import matplotlib.pyplot as plt
-
-def load_data(file_path, delimiter=',', index_col='DATE'):
-    """Load data from a CSV file."""
-    return pd.read_csv(file_path, delimiter=delimiter, index_col=index_col, parse_dates=True)
-
-def resample_to_monthly(df):
-    """Resample DataFrame to end-of-month frequency."""
-    return df.resample('ME').last()
-
-def filter_years(df, years_to_remove):
-    """Remove specified years from the DataFrame."""
-    if df.index.dtype == 'datetime64[ns]':
-        return df[~df.index.year.isin(years_to_remove)]
-    else:
-        raise ValueError("DataFrame index must be datetime64[ns] to filter by year.")
+from results_db_us import save_results_to_db, scenario_name
+from data_loader_us import load_sources
+from panel_bundle_us import build_panel_bundle, bundle_frame, scenario_mask
+from jackknife_us import leave_one_year_out, jackknife_summary, save_jackknife_to_db
+from grs_test_us import grs_test, save_grs_to_db
 
 def calculate_excess_return(portfolio_returns, risk_free_rates):
     """Calculate excess returns for a portfolio."""
@@ -26,11 +14,12 @@ def calculate_excess_return(portfolio_returns, risk_free_rates):
 def calculate_t_statistic(series):
     """Compute t-statistic for a given time series."""
     mean_value = series.mean()
-    std_error = series.std() / np.sqrt(len(series))
+    std_error = series.std() / np.sqrt(series.count())
     return mean_value / std_error
 
 def run_regression_model(dependent_var, independent_vars, data):
     """Run OLS regression and return the fitted model."""
+    import statsmodels.api as sm
     X = sm.add_constant(data[independent_vars])
     y = data[dependent_var]
     model = sm.OLS(y, X).fit()
@@ -81,58 +70,103 @@ def process_portfolio(portfolio, portfolios_df, ex_ante_betas_df, rf_rates_df, s
         "Sharpe Ratio": sharpe_ratio
     }
 
+def build_factors(rf_rates_df, sp500_returns_df, fama_french_df):
+    """MKT plus whichever Fama-French/Carhart factors are available, as the regressions use them."""
+    factors_df = pd.DataFrame({"MKT": sp500_returns_df["Return"] - (rf_rates_df["TB3MS"] / 100 / 12)})
+    for factor in ["SMB", "HML", "UMD"]:
+        if factor in fama_french_df.columns:
+            factors_df[factor] = fama_french_df[factor]
+    return factors_df
+
+def run_grs_test(bundle, output_file, results_db):
+    """Joint GRS test of all portfolio alphas for every factor model and exclusion scenario of the bundle."""
+    portfolios_df = bundle_frame(bundle, "portfolios")
+    returns_df = portfolios_df[[col for col in portfolios_df.columns if 'Beta_' not in col]]
+    rf_rates_df = bundle_frame(bundle, "risk_free")
+    excess_returns_df = returns_df.sub(rf_rates_df["TB3MS"] / 100 / 12, axis=0)
+    factors_df = build_factors(rf_rates_df, bundle_frame(bundle, "sp500"), bundle_frame(bundle, "fama_french"))
+
+    grs_df = grs_test(excess_returns_df.to_numpy(dtype=float), factors_df.to_numpy(dtype=float), bundle["masks"],
+                      list(factors_df.columns))
+    print(grs_df[grs_df["Scenario"] == "full"].to_string(index=False))
+    grs_df.to_csv(output_file, index=False)
+    save_grs_to_db(results_db, grs_df, 1)
+
+def run_jackknife(portfolios_df, rf_rates_df, sp500_returns_df, fama_french_df, output_prefix, results_db):
+    """Every leave-one-year-out version of the regression table from one pass over the data."""
+    risk_free = rf_rates_df["TB3MS"].reindex(portfolios_df.index) / 100 / 12
+    excess_returns_df = portfolios_df.sub(risk_free, axis=0)
+    factors_df = build_factors(rf_rates_df, sp500_returns_df, fama_french_df)
+
+    jackknife_df = leave_one_year_out(excess_returns_df, factors_df)
+    summary_df = jackknife_summary(jackknife_df)
+    print(summary_df.to_string(index=False))
+
+    jackknife_df.to_csv(f'{output_prefix}_jackknife.csv', index=False)
+    summary_df.to_csv(f'{output_prefix}_jackknife_summary.csv', index=False)
+    save_jackknife_to_db(results_db, jackknife_df, 1)
+
 def main():
     path = os.getcwd()
 
     # File paths
     portfolios_file = f'{path}/USResults/Prop1/portfolio_betas_returns.csv'
     fama_french_file = f'{path}/US Data/US_ff_Values.csv'
-    returns_file = f"{path}/US Data/CRSP_monthly_master_thesis_Kim.csv"
     risk_free_file = f"{path}/US Data/tbillrate_daily.csv"
     sp500_returns_file = f"{path}/US Data/SP500_rets_2003_2024.csv"
+    results_db = f"{path}/results.sqlite"
 
     # Load data
-    portfolios_df = load_data(portfolios_file, index_col='Date')
-    fama_french_df = load_data(fama_french_file)
-    returns_df = load_data(returns_file, index_col='date')
-    rf_rates_df = load_data(risk_free_file)
-    sp500_returns_df = load_data(sp500_returns_file, index_col='Date')
-
-    # Resample data to monthly frequency
-    returns_df = resample_to_monthly(returns_df)
-    rf_rates_df = resample_to_monthly(rf_rates_df)
-    sp500_returns_df = resample_to_monthly(sp500_returns_df)
-    fama_french_df = resample_to_monthly(fama_french_df)
-    portfolios_df = resample_to_monthly(portfolios_df)
-
-    # Define years to remove
-    years_to_remove = [2020]
-
-    # Filter out specified years
-    portfolios_df = filter_years(portfolios_df, years_to_remove)
-    fama_french_df = filter_years(fama_french_df, years_to_remove)
-    returns_df = filter_years(returns_df, years_to_remove)
-    rf_rates_df = filter_years(rf_rates_df, years_to_remove)
-    sp500_returns_df = filter_years(sp500_returns_df, years_to_remove)
+    frames = load_sources({
+        "portfolios": {"file": portfolios_file, "index_col": "Date"},
+        "fama_french": {"file": fama_french_file, "index_col": "DATE"},
+        "risk_free": {"file": risk_free_file, "index_col": "DATE"},
+        "sp500": {"file": sp500_returns_file, "index_col": "Date", "date_format": "%m-%d-%y"},
+    })
 
-    # Extract ex-ante betas
-    ex_ante_betas_df = portfolios_df[[col for col in portfolios_df.columns if 'Beta_' in col]]
-    portfolios_df = portfolios_df.drop(columns=ex_ante_betas_df.columns)
+    # Align everything once on the portfolios' month-end calendar
+    portfolio_dates = frames["portfolios"].index.dropna()
+    bundle = build_panel_bundle(frames, start_date=portfolio_dates.min(), end_date=portfolio_dates.max())
 
-    # Process each portfolio
-    results = []
-    for portfolio in portfolios_df.columns:
-        result = process_portfolio(portfolio, portfolios_df, ex_ante_betas_df, rf_rates_df, sp500_returns_df, fama_french_df)
-        results.append(result)
+    # Define years to remove; jackknife mode drops every year in turn instead
+    jackknife = False
+    years_to_remove = [] if jackknife else [2020]
 
-    # Convert results to DataFrame
-    results_df = pd.DataFrame(results)
+    # Slice out the scenario from the precomputed calendar masks
+    portfolios_df = bundle_frame(bundle, "portfolios", years_to_remove)
+    fama_french_df = bundle_frame(bundle, "fama_french", years_to_remove)
+    rf_rates_df = bundle_frame(bundle, "risk_free", years_to_remove)
+    sp500_returns_df = bundle_frame(bundle, "sp500", years_to_remove)
 
-    # Print results
-    print(results_df.to_string(index=False))
+    # Extract ex-ante betas
+    ex_ante_betas_df = portfolios_df[[col for col in portfolios_df.columns if 'Beta_' in col]]
+    portfolios_df = portfolios_df.drop(columns=ex_ante_betas_df.columns)
 
-    # Save results to CSV
-    results_df.to_csv(f'{path}/USResults/Prop1/regression_table_{years_to_remove[0]}.csv', index=False)
+    if jackknife:
+        run_jackknife(portfolios_df, rf_rates_df, sp500_returns_df, fama_french_df,
+                      f'{path}/USResults/Prop1/regression_table', results_db)
+    else:
+        # Process each portfolio
+        results = []
+        for portfolio in portfolios_df.columns:
+            result = process_portfolio(portfolio, portfolios_df, ex_ante_betas_df, rf_rates_df, sp500_returns_df,
+                                       fama_french_df)
+            results.append(result)
+
+        # Convert results to DataFrame
+        results_df = pd.DataFrame(results)
+
+        # Print results
+        print(results_df.to_string(index=False))
+
+        # Save results to CSV
+        results_df.to_csv(f'{path}/USResults/Prop1/regression_table_{years_to_remove[0]}.csv', index=False)
+        save_results_to_db(results_db, results_df, 1, scenario_name(years_to_remove), "regression_table",
+                           portfolio_col="Portfolio")
+
+    # Joint test of all portfolio alphas across the whole scenario grid, including this run's exclusion
+    scenario_mask(bundle, years_to_remove)
+    run_grs_test(bundle, f'{path}/USResults/Prop1/grs_test.csv', results_db)
 
 if __name__ == "__main__":
     main()
@@ -1,7 +1,8 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import os
+from results_db_us import save_results_to_db, scenario_name
+from universe_filters_us import pivot_characteristics, build_universe_masks, industry_codes, combine_masks, apply_universe_mask
 
 def load_data(beta_file, returns_file, risk_free_file, market_returns_file):
     beta_values_df = pd.read_csv(beta_file, parse_dates=["Date"]).set_index("Date")
@@ -12,17 +13,19 @@ def load_data(beta_file, returns_file, risk_free_file, market_returns_file):
     return beta_values_df, returns_df, rf_rates_df, market_returns_df
 
 def filter_technology_firms(returns_df):
-    # tech_sic_codes = list(range(3570, 3580)) + list(range(3680, 3690)) + [3695] + \
-    #                  list(range(7370, 7373)) + [7373, 7375] + \
-    #                  list(range(3622, 3623)) + list(range(3661, 3670)) + \
-    #                  list(range(3670, 3680)) + list(range(3810, 3813))
-    
-    # returns_df = returns_df[~returns_df['siccd'].isin(tech_sic_codes)]
     returns_df = returns_df.pivot(index="date", columns="permno", values="ret")
     returns_df.columns = returns_df.columns.astype(str)
     
     return returns_df
 
+def apply_universe(beta_values_df, returns_df, universe_masks, universe):
+    # Masks are built once from the long CRSP frame; each variant is one combine and a where()
+    universe_mask = combine_masks(universe_masks, universe)
+    beta_values_df = apply_universe_mask(beta_values_df, universe_mask)
+    returns_df = apply_universe_mask(returns_df, universe_mask)
+    
+    return beta_values_df, returns_df
+
 def preprocess_data(beta_values_df, returns_df, rf_rates_df, market_returns_df, start_date, end_date):
     beta_values_df = beta_values_df.resample('M').last().loc[start_date:end_date]
     returns_df = returns_df.resample('M').last().loc[start_date:end_date]
@@ -54,7 +57,69 @@ def calculate_bab_factor(beta_values_df, returns_df):
     bab_factor = (low_returns_adjusted - high_returns_adjusted)
     return bab_factor, bab_factor.resample('Y').sum()
 
+def rank_within_segments(segment_ids, values):
+    # Average ranks (1-based) of values inside each segment; inputs must be sorted by (segment, value)
+    n = len(values)
+    positions = np.arange(n)
+    segment_starts = np.flatnonzero(np.r_[True, segment_ids[1:] != segment_ids[:-1]])
+    segment_lengths = np.diff(np.r_[segment_starts, n])
+    position_in_segment = positions - np.repeat(segment_starts, segment_lengths)
+    
+    tie_starts = np.flatnonzero(np.r_[True, (segment_ids[1:] != segment_ids[:-1]) | (values[1:] != values[:-1])])
+    tie_lengths = np.diff(np.r_[tie_starts, n])
+    tie_first = np.repeat(position_in_segment[tie_starts], tie_lengths)
+    ranks = tie_first + (np.repeat(tie_lengths, tie_lengths) - 1) / 2 + 1
+    
+    return ranks, segment_starts, segment_lengths
+
+def calculate_industry_neutral_bab_factor(beta_values_df, returns_df, industry_df, min_stocks=2):
+    # Same rank weighting and leverage as calculate_bab_factor, but applied inside every
+    # date x industry segment; the industry BABs are then equally weighted within each month.
+    returns_df = returns_df.reindex(index=beta_values_df.index, columns=beta_values_df.columns)
+    industry_df = industry_df.reindex(index=beta_values_df.index, columns=beta_values_df.columns)
+    
+    betas = beta_values_df.to_numpy(dtype=float)
+    returns = np.nan_to_num(returns_df.to_numpy(dtype=float))
+    industries = industry_df.to_numpy(dtype=float)
+    
+    date_idx, stock_idx = np.nonzero(~np.isnan(betas) & ~np.isnan(industries))
+    _, industry_idx = np.unique(industries[date_idx, stock_idx], return_inverse=True)
+    segment_ids = date_idx.astype(np.int64) * (industry_idx.max(initial=0) + 1) + industry_idx
+    cell_betas = betas[date_idx, stock_idx]
+    
+    order = np.lexsort((cell_betas, segment_ids))
+    segment_ids, cell_betas = segment_ids[order], cell_betas[order]
+    cell_returns = returns[date_idx[order], stock_idx[order]]
+    
+    ranks, segment_starts, segment_lengths = rank_within_segments(segment_ids, cell_betas)
+    if len(ranks) == 0:
+        bab_factor = pd.Series(np.nan, index=beta_values_df.index)
+        return bab_factor, bab_factor.resample('Y').sum()
+    
+    total_ranks = np.add.reduceat(ranks, segment_starts)
+    max_ranks = np.maximum.reduceat(ranks, segment_starts)
+    segment_total = np.repeat(total_ranks, segment_lengths)
+    segment_max = np.repeat(max_ranks, segment_lengths)
+    
+    low_portfolio_returns = np.add.reduceat(ranks / segment_total * cell_returns, segment_starts)
+    high_portfolio_returns = np.add.reduceat((segment_max - ranks) / segment_total * cell_returns, segment_starts)
+    mean_beta = np.add.reduceat(cell_betas, segment_starts) / segment_lengths
+    
+    segment_bab = (low_portfolio_returns - high_portfolio_returns) / mean_beta
+    keep = (segment_lengths >= min_stocks) & np.isfinite(segment_bab)
+    segment_dates = date_idx[order][segment_starts][keep]
+    
+    num_dates = len(beta_values_df.index)
+    bab_sum = np.bincount(segment_dates, weights=segment_bab[keep], minlength=num_dates)
+    industry_count = np.bincount(segment_dates, minlength=num_dates)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        bab_values = bab_sum / industry_count
+    
+    bab_factor = pd.Series(bab_values, index=beta_values_df.index)
+    return bab_factor, bab_factor.resample('Y').sum()
+
 def plot_bab_factor(bab_factor, title, xlabel, ylabel, width):
+    import matplotlib.pyplot as plt
     plt.figure(figsize=(12, 6))
     plt.axhline(0, color='black', linewidth=1)
     
@@ -82,20 +147,33 @@ def main():
     RISK_FREE_FILE = f"{path}/US Data/tbillrate_daily.csv"
     MKT_RETURNS_FILE = f"{path}/US Data/SP500_rets_2003_2024.csv"
     OUTPUT_FILE = f"{path}/USResults/Prop2/bab_factor_us.csv"
+    RESULTS_DB = f"{path}/results.sqlite"
     
     start_date, end_date = '2003-01-01', '2023-12-31'
+    universe = []  # e.g. ['ex_tech', 'ex_financials', 'ex_utilities', 'price_floor', 'size_floor']
+    industry_neutral = False
     
     beta_values_df, returns_df, rf_rates_df, market_returns_df = load_data(BETA_FILE, RETURNS_FILE, RISK_FREE_FILE, MKT_RETURNS_FILE)
+    characteristics = pivot_characteristics(returns_df)
+    universe_masks = build_universe_masks(characteristics)
     returns_df = filter_technology_firms(returns_df)
     beta_values_df, returns_df, rf_rates_df, market_returns_df = preprocess_data(beta_values_df, returns_df, rf_rates_df, market_returns_df, start_date, end_date)
+    beta_values_df, returns_df = apply_universe(beta_values_df, returns_df, universe_masks, universe)
     
-    bab_factor, bab_factor_yearly = calculate_bab_factor(beta_values_df, returns_df)
+    if industry_neutral:
+        industry_df = industry_codes(characteristics).resample('M').last()
+        bab_factor, bab_factor_yearly = calculate_industry_neutral_bab_factor(beta_values_df, returns_df, industry_df)
+    else:
+        bab_factor, bab_factor_yearly = calculate_bab_factor(beta_values_df, returns_df)
     
     plot_bab_factor(bab_factor, "Monthly BAB Factor Returns (United States)", "Date", "Return (%)", 40)
     plot_bab_factor(bab_factor_yearly, "Yearly BAB Factor Returns (United States)", "Year", "Return (%)", 350)
     
     print(bab_factor_yearly)
     bab_factor.to_csv(OUTPUT_FILE)
+    save_results_to_db(RESULTS_DB, bab_factor, 2, scenario_name([]), "bab_factor",
+                       {"start_date": start_date, "end_date": end_date, "universe": sorted(universe),
+                        "industry_neutral": industry_neutral})
     print("BAB Factor data saved to", OUTPUT_FILE)
 
 if __name__ == "__main__":
@@ -1,36 +1,10 @@
 import os
 import pandas as pd
 import numpy as np
-import statsmodels.api as sm
-import matplotlib.pyplot as plt
-
-def load_data(file_path, date_col, date_format=None):
-    df = pd.read_csv(file_path)
-    try:
-        df[date_col] = pd.to_datetime(df[date_col], format=date_format, errors='coerce')
-    except Exception as e:
-        print(f"Error parsing dates in {file_path}: {e}")
-    df.set_index(date_col, inplace=True)
-    return df
-
-def filter_technology_firms(df):
-    tech_sic_codes = list(range(3570, 3580)) + list(range(3680, 3690)) + [3695] + \
-                     list(range(7370, 7373)) + [7373, 7375] + \
-                     list(range(3622, 3623)) + list(range(3661, 3670)) + \
-                     list(range(3670, 3680)) + list(range(3810, 3813))
-    
-    if 'siccd' in df.columns:
-        df = df[~df['siccd'].isin(tech_sic_codes)]
-    return df
-
-def preprocess_data(df, resample_freq='M', start_date='2015-01-01', end_date='2018-12-31', years_to_remove=None):
-    if not isinstance(df.index, pd.DatetimeIndex):
-        df.index = pd.to_datetime(df.index, errors='coerce')
-    df = df.resample(resample_freq).last()
-    df = df.loc[start_date:end_date]
-    if years_to_remove:
-        df = df.loc[~df.index.year.isin(years_to_remove)]
-    return df
+from results_db_us import save_results_to_db, scenario_name
+from data_loader_us import load_sources
+from panel_bundle_us import build_panel_bundle, bundle_frame
+from jackknife_us import leave_one_year_out, jackknife_summary, save_jackknife_to_db
 
 def calculate_excess_return(portfolio_df, risk_free_df):
     return portfolio_df.iloc[:, 0] - (risk_free_df.iloc[:, 0] / 100 / 12)
@@ -44,39 +18,49 @@ def calculate_sharpe_ratio(excess_returns):
     return annualized_mean / annualized_volatility
 
 def run_regression_model(dependent_var, independent_vars, data):
+    import statsmodels.api as sm
     X = sm.add_constant(data[independent_vars])
     y = data[dependent_var]
     model = sm.OLS(y, X).fit()
     return model
 
+def regression_table(models, excess_returns, ex_ante_beta):
+    row = {"Portfolio": "BAB", "Excess Return": excess_returns.mean()}
+    for name, model in models.items():
+        row[f"{name} Alpha"] = model.params["const"]
+        row[f"{name} Alpha t-stat"] = model.tvalues["const"]
+        row[f"{name} R²"] = model.rsquared
+    row["Beta (Ex-Ante)"] = ex_ante_beta.mean()
+    row["Volatility"] = excess_returns.std()
+    row["Sharpe Ratio"] = calculate_sharpe_ratio(excess_returns)
+    return pd.DataFrame([row])
+
 def main():
     path = os.getcwd()
     years_to_remove = []
+    jackknife = False  # every leave-one-year-out scenario of the BAB regressions from one pass
+    results_db = f"{path}/results.sqlite"
     files = {
-        "returns": f"{path}/US Data/CRSP_monthly_master_thesis_Kim.csv",
         "risk_free": f"{path}/US Data/tbillrate_daily.csv",
         "sp500": f"{path}/US Data/SP500_rets_2003_2024.csv",
         "bab_factor": f"{path}/USResults/Prop2/bab_factor_us.csv",
         "stock_betas": f"{path}/USResults/us_beta_values.csv",
         "fama_french": f"{path}/US Data/US_ff_Values.csv"
     }
-    us_returns_df = load_data(files["returns"], "date", "%d%b%Y")
-    us_returns_df = filter_technology_firms(us_returns_df)
-    us_rf_rates_df = load_data(files["risk_free"], "DATE", None)
-    us_sp500_df = load_data(files["sp500"], "Date", "%m-%d-%y")
-    us_bab_factor_df = load_data(files["bab_factor"], "Date")
-    us_stock_betas_df = load_data(files["stock_betas"], "Date")
-    us_fama_french_df = load_data(files["fama_french"], "DATE")
-    dfs = [us_returns_df, us_rf_rates_df, us_sp500_df, us_bab_factor_df, us_stock_betas_df, us_fama_french_df]
-    for df in dfs:
-        if not isinstance(df.index, pd.DatetimeIndex):
-            df.index = pd.to_datetime(df.index, errors='coerce')
-    us_returns_df = preprocess_data(us_returns_df, years_to_remove=years_to_remove)
-    us_rf_rates_df = preprocess_data(us_rf_rates_df, years_to_remove=years_to_remove)
-    us_sp500_df = preprocess_data(us_sp500_df, years_to_remove=years_to_remove)
-    us_bab_factor_df = preprocess_data(us_bab_factor_df, years_to_remove=years_to_remove)
-    us_stock_betas_df = preprocess_data(us_stock_betas_df, years_to_remove=years_to_remove)
-    us_fama_french_df = preprocess_data(us_fama_french_df, years_to_remove=years_to_remove)
+    frames = load_sources({
+        "risk_free": {"file": files["risk_free"], "index_col": "DATE"},
+        "sp500": {"file": files["sp500"], "index_col": "Date", "date_format": "%m-%d-%y"},
+        "bab_factor": {"file": files["bab_factor"], "index_col": "Date"},
+        "stock_betas": {"file": files["stock_betas"], "index_col": "Date"},
+        "fama_french": {"file": files["fama_french"], "index_col": "DATE"},
+    })
+    # One month-end calendar for every input instead of resampling each frame separately
+    bundle = build_panel_bundle(frames, start_date='2015-01-01', end_date='2018-12-31')
+    us_rf_rates_df = bundle_frame(bundle, "risk_free", years_to_remove)
+    us_sp500_df = bundle_frame(bundle, "sp500", years_to_remove)
+    us_bab_factor_df = bundle_frame(bundle, "bab_factor", years_to_remove)
+    us_stock_betas_df = bundle_frame(bundle, "stock_betas", years_to_remove)
+    us_fama_french_df = bundle_frame(bundle, "fama_french", years_to_remove)
     us_bab_excess_return = calculate_excess_return(us_bab_factor_df, us_rf_rates_df)
     ex_ante_us_bab_beta = calculate_ex_ante_beta(us_stock_betas_df)
     us_bab_sharpe_ratio = calculate_sharpe_ratio(us_bab_excess_return)
@@ -88,12 +72,26 @@ def main():
         if factor in us_fama_french_df.columns:
             us_regression_data[factor] = us_fama_french_df[factor]
     us_regression_data = us_regression_data.dropna()
+    if jackknife:
+        jackknife_df = leave_one_year_out(us_regression_data[["r_P_excess"]].rename(columns={"r_P_excess": "BAB"}),
+                                          us_regression_data.drop(columns="r_P_excess"))
+        summary_df = jackknife_summary(jackknife_df)
+        print(summary_df.to_string(index=False))
+        jackknife_df.to_csv(f"{path}/USResults/Prop2/bab_regression_jackknife.csv", index=False)
+        summary_df.to_csv(f"{path}/USResults/Prop2/bab_regression_jackknife_summary.csv", index=False)
+        save_jackknife_to_db(results_db, jackknife_df, 2)
+        return
     us_capm_model = run_regression_model("r_P_excess", ["MKT"], us_regression_data)
     us_fama_french_3_model = run_regression_model("r_P_excess", ["MKT", "SMB", "HML"], us_regression_data)
     us_carhart_4_model = run_regression_model("r_P_excess", ["MKT", "SMB", "HML", "UMD"], us_regression_data)
     print(us_capm_model.summary())
     print(us_fama_french_3_model.summary())
     print(us_carhart_4_model.summary())
+    results_df = regression_table({"CAPM": us_capm_model, "Three Factor": us_fama_french_3_model,
+                                   "Four Factor": us_carhart_4_model}, us_bab_excess_return, ex_ante_us_bab_beta)
+    results_df.to_csv(f"{path}/USResults/Prop2/bab_regression_table.csv", index=False)
+    save_results_to_db(results_db, results_df, 2, scenario_name(years_to_remove), "regression_table",
+                       {"start_date": "2015-01-01", "end_date": "2018-12-31"}, portfolio_col="Portfolio")
 
 if __name__ == "__main__":
     main()
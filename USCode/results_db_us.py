@@ -0,0 +1,126 @@
+import hashlib
+import json
+import sqlite3
+import pandas as pd
+
+MARKET = "US"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    market TEXT NOT NULL,
+    proposition TEXT NOT NULL,
+    scenario TEXT NOT NULL,
+    params TEXT NOT NULL,
+    result_table TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    PRIMARY KEY (market, proposition, scenario, params, result_table)
+);
+CREATE TABLE IF NOT EXISTS result_rows (
+    content_hash TEXT NOT NULL,
+    date TEXT,
+    portfolio TEXT,
+    metric TEXT NOT NULL,
+    value REAL
+);
+CREATE INDEX IF NOT EXISTS idx_results_hash ON results (content_hash);
+CREATE INDEX IF NOT EXISTS idx_rows_hash ON result_rows (content_hash);
+CREATE INDEX IF NOT EXISTS idx_rows_date ON result_rows (date);
+CREATE INDEX IF NOT EXISTS idx_rows_portfolio ON result_rows (portfolio, metric);
+"""
+
+
+def scenario_name(years_to_remove):
+    """Scenario key for a years_to_remove list, e.g. 'full' or 'ex_2020'."""
+    years = [str(year) for year in years_to_remove if str(year)]
+    return "ex_" + "_".join(years) if years else "full"
+
+
+def connect_results_db(db_file):
+    conn = sqlite3.connect(db_file)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def split_column(column):
+    """Split prefixed portfolio columns such as 'Return_0' into ('Return', '0')."""
+    column = str(column)
+    metric, _, portfolio = column.rpartition("_")
+    if metric and portfolio.isdigit():
+        return metric, portfolio
+    return None, column
+
+
+def to_long_format(df, result_table, portfolio_col=None):
+    """Flatten a result frame to (date, portfolio, metric, value) rows."""
+    if portfolio_col is not None:
+        # Regression tables: one row per portfolio, one column per statistic
+        long_df = df.melt(id_vars=[portfolio_col], var_name="metric", value_name="value")
+        long_df = long_df.rename(columns={portfolio_col: "portfolio"})
+        long_df["date"] = None
+    else:
+        # Time series: date index, one column per portfolio (optionally prefixed with the metric)
+        frame = df.to_frame(name=result_table) if isinstance(df, pd.Series) else df
+        frame = frame.copy()
+        frame.index = pd.to_datetime(frame.index).strftime("%Y-%m-%d")
+        frame.index.name = "date"
+        long_df = frame.reset_index().melt(id_vars=["date"], var_name="column", value_name="value")
+        split = [split_column(column) for column in long_df["column"]]
+        long_df["metric"] = [metric or result_table for metric, _ in split]
+        long_df["portfolio"] = [portfolio for _, portfolio in split]
+
+    long_df["portfolio"] = long_df["portfolio"].astype(str)
+    long_df["value"] = pd.to_numeric(long_df["value"], errors="coerce")
+    return long_df[["date", "portfolio", "metric", "value"]]
+
+
+def save_results_to_db(db_file, df, proposition, scenario, result_table, params=None, portfolio_col=None):
+    """Store a result frame under (market, proposition, scenario, params, table); identical payloads are stored once."""
+    long_df = to_long_format(df, result_table, portfolio_col)
+    content_hash = hashlib.sha256(long_df.to_csv(index=False).encode()).hexdigest()
+    params = json.dumps(params or {}, sort_keys=True, default=str)
+
+    conn = connect_results_db(db_file)
+    with conn:
+        stored = conn.execute("SELECT 1 FROM result_rows WHERE content_hash = ? LIMIT 1", (content_hash,)).fetchone()
+        if stored is None:
+            conn.executemany(
+                "INSERT INTO result_rows (content_hash, date, portfolio, metric, value) VALUES (?, ?, ?, ?, ?)",
+                [(content_hash, *row) for row in long_df.itertuples(index=False, name=None)]
+            )
+        conn.execute(
+            "INSERT OR REPLACE INTO results (market, proposition, scenario, params, result_table, content_hash) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (MARKET, str(proposition), scenario, params, result_table, content_hash)
+        )
+        # Drop payloads that no key points to any more after a replace
+        conn.execute("DELETE FROM result_rows WHERE content_hash NOT IN (SELECT content_hash FROM results)")
+    conn.close()
+    return content_hash
+
+
+def query_results(db_file, metric, portfolio=None, proposition=None, result_table=None, market=None):
+    """Compare one metric across scenarios: rows are dates/portfolios, columns are market/scenario keys.
+
+    Undated rows (summary tables) get an empty date when mixed with dated ones. Two rows on the
+    same date, portfolio and key raise instead of one silently winning.
+    """
+    query = ("SELECT r.market, r.proposition, r.scenario, r.params, r.result_table, v.date, v.portfolio, v.value "
+             "FROM results r JOIN result_rows v ON v.content_hash = r.content_hash WHERE v.metric = ?")
+    args = [metric]
+    for column, value in (("v.portfolio", portfolio), ("r.proposition", proposition),
+                          ("r.result_table", result_table), ("r.market", market)):
+        if value is not None:
+            query += f" AND {column} = ?"
+            args.append(str(value))
+
+    conn = connect_results_db(db_file)
+    df = pd.read_sql_query(query, conn, params=args)
+    conn.close()
+    index = ["date", "portfolio"] if df["date"].notna().any() else ["portfolio"]
+    columns = ["market", "proposition", "scenario", "params", "result_table"]
+    df = df.fillna({"date": "", "params": ""})
+    duplicated = df.duplicated(index + columns)
+    if duplicated.any():
+        first = df.loc[duplicated, index + columns].iloc[0].to_dict()
+        raise ValueError(f"{int(duplicated.sum())} duplicate rows for metric '{metric}', first {first}")
+    return df.set_index(index + columns)["value"].unstack(columns)
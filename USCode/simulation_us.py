@@ -0,0 +1,137 @@
+import os
+import pandas as pd
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from beta_estimators_us import estimate_betas
+from portfolio_sorts_us import assign_sort_buckets, aggregate_buckets
+from prop2_us import calculate_bab_factor
+
+NULL_MODEL = {
+    "market_mean": 0.006,          # monthly market excess return
+    "market_volatility": 0.045,
+    "beta_mean": 1.0,
+    "beta_dispersion": 0.35,
+    "idiosyncratic_volatility": 0.10,
+    "alpha_slope": 0.0,            # alpha_i = alpha_slope * (1 - beta_i): SML flattening (Proposition 1/2)
+    "funding_sensitivity": 0.0,    # r_i -= funding_sensitivity * (1 - beta_i) * dTED: funding shocks (Proposition 3)
+    "ted_persistence": 0.9,
+    "ted_volatility": 0.002,
+}
+
+
+def load_missing_pattern(returns_file):
+    """Month x stock availability of the CRSP panel, so simulated markets have the same holes."""
+    crsp_df = pd.read_csv(returns_file, usecols=['permno', 'date', 'ret'])
+    crsp_df['date'] = pd.to_datetime(crsp_df['date'], format='%d%b%Y') + pd.offsets.MonthEnd(0)
+    crsp_df['ret'] = pd.to_numeric(crsp_df['ret'], errors='coerce')
+    returns_df = crsp_df.pivot_table(index='date', columns='permno', values='ret', aggfunc='last', dropna=False)
+    returns_df = returns_df.loc['2003-01-01':'2023-12-31']
+    return returns_df.index, returns_df.notna().to_numpy()
+
+
+def simulate_market(rng, available, model):
+    """One synthetic market: CAPM returns with optional funding-constraint effects, masked like the real panel."""
+    num_months, num_stocks = available.shape
+    market = rng.normal(model["market_mean"], model["market_volatility"], num_months)
+    true_betas = rng.normal(model["beta_mean"], model["beta_dispersion"], num_stocks)
+
+    ted = np.empty(num_months)
+    ted[0] = 0.0
+    shocks = rng.normal(0, model["ted_volatility"], num_months)
+    for t in range(1, num_months):
+        ted[t] = model["ted_persistence"] * ted[t - 1] + shocks[t]
+    delta_ted = np.r_[0.0, np.diff(ted)]
+
+    low_beta_tilt = 1 - true_betas
+    returns = (model["alpha_slope"] * low_beta_tilt[None, :]
+               + market[:, None] * true_betas[None, :]
+               - model["funding_sensitivity"] * delta_ted[:, None] * low_beta_tilt[None, :]
+               + rng.normal(0, model["idiosyncratic_volatility"], (num_months, num_stocks)))
+    returns[~available] = np.nan
+    return returns, market, delta_ted
+
+
+def ols_tstats(y, x):
+    """Coefficient t-statistics of column-wise OLS of every column of y on [1, x] over their common rows."""
+    design = np.column_stack([np.ones(len(x)), x])
+    rows = np.isfinite(y).all(axis=1) & np.isfinite(design).all(axis=1)
+    y, design = y[rows], design[rows]
+    xtx_inv = np.linalg.inv(design.T @ design)
+    coefficients = xtx_inv @ design.T @ y
+    residuals = y - design @ coefficients
+    sigma2 = (residuals ** 2).sum(axis=0) / (len(y) - design.shape[1])
+    return coefficients / np.sqrt(np.outer(np.diag(xtx_inv), sigma2))
+
+
+def run_chain(returns, market, delta_ted, dates, num_portfolios, estimator):
+    """Production beta -> portfolio sort -> BAB -> regression chain on one market; returns the test t-stats."""
+    returns_df = pd.DataFrame(returns, index=dates)
+    market_excess_return = pd.Series(market, index=dates)
+
+    beta_df = estimate_betas(returns_df, market_excess_return, estimator)
+    # Sort on the previous month's betas so that portfolio returns are out of sample
+    sort_betas_df = beta_df.shift(1)
+
+    bucket_df = assign_sort_buckets([sort_betas_df], [num_portfolios])
+    portfolio_returns = aggregate_buckets(bucket_df, returns_df, num_portfolios).to_numpy()
+    low_minus_high = portfolio_returns[:, 0] - portfolio_returns[:, -1]
+    bab_factor, _ = calculate_bab_factor(sort_betas_df, returns_df)
+    bab_factor = bab_factor.where(sort_betas_df.notna().any(axis=1)).to_numpy()
+
+    capm = ols_tstats(np.column_stack([low_minus_high, bab_factor]), market)
+    funding = ols_tstats(bab_factor[:, None], delta_ted)
+    return {
+        "P1 low-minus-high alpha t": capm[0, 0],
+        "P2 BAB alpha t": capm[0, 1],
+        "P3 BAB dTED slope t": funding[1, 0],
+    }
+
+
+def simulate_batch(seed, num_paths, available, dates, model, num_portfolios, estimator):
+    """Simulate and process num_paths markets one after another; only one market is in memory at a time."""
+    rng = np.random.default_rng(seed)
+    results = []
+    for _ in range(num_paths):
+        returns, market, delta_ted = simulate_market(rng, available, model)
+        results.append(run_chain(returns, market, delta_ted, dates, num_portfolios, estimator))
+    return results
+
+
+def run_simulation(available, dates, num_paths=1000, batch_size=10, model=None, num_portfolios=10,
+                   estimator='correlation', max_workers=None, seed=0):
+    """Distribute batches of paths over a process pool and collect the per-path test statistics."""
+    model = {**NULL_MODEL, **(model or {})}
+    seeds = np.random.SeedSequence(seed).spawn((num_paths + batch_size - 1) // batch_size)
+    batches = [min(batch_size, num_paths - i * batch_size) for i in range(len(seeds))]
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(simulate_batch, batch_seed, n, available, dates, model, num_portfolios, estimator)
+                   for batch_seed, n in zip(seeds, batches)]
+        results = [row for future in futures for row in future.result()]
+
+    return pd.DataFrame(results)
+
+
+def rejection_rates(statistics_df, critical_value=1.96):
+    """Share of paths in which each two-sided test rejects at the given critical value."""
+    return (statistics_df.abs() > critical_value).mean().rename("Rejection Rate")
+
+
+def main():
+    path = os.getcwd()
+    RETURNS_FILE = f"{path}/US Data/CRSP_monthly_master_thesis_Kim.csv"
+    OUTPUT_FILE = f"{path}/USResults/simulation_rejection_rates_us.csv"
+
+    num_paths = 1000
+    model = {"alpha_slope": 0.0, "funding_sensitivity": 0.0}  # the null; raise either to study power
+
+    dates, available = load_missing_pattern(RETURNS_FILE)
+    statistics_df = run_simulation(available, dates, num_paths=num_paths, model=model)
+
+    rates = rejection_rates(statistics_df)
+    print(rates.to_string())
+    rates.to_csv(OUTPUT_FILE)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import pandas as pd
+import numpy as np
+
+# SIC code sets used for the universe exclusions, built once at import time
+TECH_SIC_CODES = frozenset(
+    list(range(3570, 3580)) + list(range(3680, 3690)) + [3695] +
+    list(range(7370, 7373)) + [7373, 7375] +
+    list(range(3622, 3623)) + list(range(3661, 3670)) +
+    list(range(3670, 3680)) + list(range(3810, 3813))
+)
+FINANCIAL_SIC_CODES = frozenset(range(6000, 7000))
+UTILITY_SIC_CODES = frozenset(range(4900, 5000))
+
+SIC_EXCLUSIONS = {
+    "ex_tech": TECH_SIC_CODES,
+    "ex_financials": FINANCIAL_SIC_CODES,
+    "ex_utilities": UTILITY_SIC_CODES,
+}
+
+
+def pivot_characteristics(crsp_df, columns=("siccd", "prc", "shrout")):
+    """Pivot the time-varying CRSP characteristics to month-end date x permno panels."""
+    crsp_df = crsp_df.copy()
+    crsp_df["date"] = pd.to_datetime(crsp_df["date"]) + pd.offsets.MonthEnd(0)
+    crsp_df["permno"] = crsp_df["permno"].astype(str)
+
+    panels = {}
+    for column in columns:
+        if column in crsp_df.columns:
+            values = pd.to_numeric(crsp_df[column], errors="coerce")
+            panels[column] = crsp_df.assign(value=values).groupby(["date", "permno"])["value"].last().unstack()
+    return panels
+
+
+def build_universe_masks(panels, price_floor=5.0, size_quantile=0.2):
+    """Build boolean date x permno membership masks for every universe variant once."""
+    masks = {}
+
+    if "siccd" in panels:
+        # Firms keep their last reported industry until CRSP records a change
+        sic = panels["siccd"].ffill().to_numpy()
+        known = ~np.isnan(sic)
+        for name, codes in SIC_EXCLUSIONS.items():
+            excluded = np.isin(np.where(known, sic, -1), np.fromiter(codes, dtype=float))
+            masks[name] = pd.DataFrame(~excluded, index=panels["siccd"].index, columns=panels["siccd"].columns)
+
+    if "prc" in panels:
+        # CRSP stores bid/ask midpoints as negative prices
+        price = np.abs(panels["prc"].to_numpy())
+        masks["price_floor"] = pd.DataFrame(price >= price_floor, index=panels["prc"].index,
+                                            columns=panels["prc"].columns)
+
+        if "shrout" in panels:
+            size = price * panels["shrout"].reindex_like(panels["prc"]).to_numpy()
+            cutoff = np.nanquantile(np.where(size > 0, size, np.nan), size_quantile, axis=1, keepdims=True)
+            masks["size_floor"] = pd.DataFrame(size >= cutoff, index=panels["prc"].index,
+                                               columns=panels["prc"].columns)
+
+    return masks
+
+
+def industry_codes(panels, digits=2):
+    """Time-varying SIC industry groups (major group by default) as a date x permno panel, NaN if unknown."""
+    return (panels["siccd"].ffill() // 10 ** (4 - digits))
+
+
+def combine_masks(masks, names):
+    """AND together the named masks; combinations are cached in the masks dict."""
+    names = sorted(names)
+    if not names:
+        return None
+    key = "+".join(names)
+    if key not in masks:
+        combined = masks[names[0]]
+        for name in names[1:]:
+            combined = combined & masks[name].reindex(index=combined.index, columns=combined.columns, fill_value=False)
+        masks[key] = combined
+    return masks[key]
+
+
+def apply_universe_mask(panel_df, mask_df):
+    """Blank out (set to NaN) every date x stock cell of a wide panel that is outside the universe."""
+    if mask_df is None:
+        return panel_df
+    aligned = mask_df.reindex(index=panel_df.index, columns=panel_df.columns, fill_value=False)
+    return panel_df.where(aligned.to_numpy())
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+# Plausible value ranges per unit; anything outside is a data error, not a market move
+UNIT_RANGES = {
+    "decimal_return": (-1.0, 10.0),
+    "percent_return": (-100.0, 1000.0),
+    "percent_rate": (-5.0, 25.0),
+}
+
+# Median |monthly return| (or max |rate|) separating decimal from percent inputs: monthly decimal
+# returns sit around 0.05, percent returns around 5, and a percent rate series never stays below
+# 0.25 for 20 years. Daily returns are summed to months first; their own median is pulled toward
+# zero by days without a price change and would read a daily percent panel as decimal
+SCALE_CUTOFF = 0.25
+
+
+def coerce_numeric(df, columns):
+    """Numeric values of the given columns and a per-column count of non-empty cells that are not numbers."""
+    values = df[columns]
+    text_columns = [column for column in columns if not pd.api.types.is_numeric_dtype(values[column])]
+    if not text_columns:
+        return values.to_numpy(dtype=float), pd.Series(dtype=int)
+    coerced = values[text_columns].apply(pd.to_numeric, errors='coerce')
+    counts = (coerced.isna() & values[text_columns].notna()).sum()
+    values = values.copy()
+    values[text_columns] = coerced
+    return values.to_numpy(dtype=float), counts[counts > 0]
+
+
+def monthly_magnitudes(values, dates, groups=()):
+    """|Sum| of every column per calendar month (and per group of a long frame), empty and zero months dropped."""
+    by = [np.asarray(group) for group in groups] + [dates.to_period('M')]
+    sums = pd.DataFrame(values).groupby(by).sum(min_count=1).to_numpy()
+    magnitudes = np.abs(sums[np.isfinite(sums)])
+    return magnitudes[magnitudes > 0]
+
+
+def check_source(name, df, unit, columns=None, keys=None, date_col=None, start_date=None, end_date=None):
+    """All checks for one parsed source, as a list of issue dicts.
+
+    df is the frame as read, before any pivot or resample: long frames name their date column
+    and their identifying keys (e.g. ['permno', 'date']), wide frames are indexed by date.
+    unit is a key of UNIT_RANGES and columns the value columns to check (all non-key columns by
+    default). Duplicates, impossible values and unit mix-ups are errors; non-numeric cells,
+    months without data and a calendar that does not cover [start_date, end_date] are warnings.
+    """
+    issues = []
+
+    def report(check, severity, detail):
+        issues.append({"Source": name, "Check": check, "Severity": severity, "Detail": detail})
+
+    keys = list(keys or [])
+    if columns is None:
+        columns = [column for column in df.columns if column not in keys and column != date_col]
+    dates = pd.DatetimeIndex(df.index if date_col is None else df[date_col])
+
+    unparsed = int(dates.isna().sum())
+    if unparsed:
+        report("dates", "error", f"{unparsed} unparseable dates")
+
+    duplicated = df.duplicated(keys) if keys else dates.duplicated()
+    if duplicated.any():
+        first = df[duplicated].iloc[0][keys].to_dict() if keys else dates[duplicated][0].date()
+        report("duplicates", "error", f"{int(duplicated.sum())} duplicate {keys or 'date'} rows, first {first}")
+
+    values, non_numeric = coerce_numeric(df, columns)
+    for column, count in non_numeric.items():
+        report("non-numeric", "warning", f"{count} non-numeric cells in '{column}' are read as missing")
+
+    magnitudes = np.abs(values[np.isfinite(values)])
+    if magnitudes.size:
+        low, high = UNIT_RANGES[unit]
+        finite = values[np.isfinite(values)]
+        outside = int(((finite < low) | (finite > high)).sum())
+        if outside:
+            report("range", "error", f"{outside} values outside [{low}, {high}] for {unit}")
+        if unit in ("decimal_return", "percent_return"):
+            monthly = monthly_magnitudes(values, dates, [df[key] for key in keys if key != date_col])
+            median = np.median(monthly) if monthly.size else np.nan
+            if unit == "decimal_return" and median > SCALE_CUTOFF:
+                report("units", "error", f"median |monthly return| {median:.3g} looks like percent, expected decimal")
+            elif unit == "percent_return" and median < SCALE_CUTOFF:
+                report("units", "error", f"median |monthly return| {median:.3g} looks like decimal, expected percent")
+        elif unit == "percent_rate" and magnitudes.max() < SCALE_CUTOFF:
+            report("units", "error", f"max |rate| {magnitudes.max():.3g} looks like decimal, expected percent")
+    else:
+        report("values", "error", "no numeric values")
+
+    months = dates[dates.notna()].to_period('M').unique()
+    if len(months):
+        missing = pd.period_range(months.min(), months.max(), freq='M').difference(months)
+        if len(missing):
+            shown = ', '.join(str(month) for month in missing[:5])
+            report("gaps", "warning", f"{len(missing)} months without data ({shown}{', ...' if len(missing) > 5 else ''})")
+        if start_date and months.min() > pd.Period(start_date, 'M'):
+            report("coverage", "warning", f"starts {months.min()}, sample starts {pd.Period(start_date, 'M')}")
+        if end_date and months.max() < pd.Period(end_date, 'M'):
+            report("coverage", "warning", f"ends {months.max()}, sample ends {pd.Period(end_date, 'M')}")
+    return issues
+
+
+def validate_inputs(sources, start_date=None, end_date=None):
+    """Check every source of a stage in one pass, before any pivot, resample or estimation.
+
+    sources maps a name to the keyword arguments of check_source (frame under "frame"). Every
+    issue is printed; if any is an error a ValueError lists the failing sources, so one run
+    shows all broken inputs at once. Returns the issues as a frame.
+    """
+    issues = []
+    for name, spec in sources.items():
+        spec = dict(spec)
+        issues += check_source(name, spec.pop("frame"), start_date=start_date, end_date=end_date, **spec)
+
+    issues_df = pd.DataFrame(issues, columns=["Source", "Check", "Severity", "Detail"])
+    for issue in issues_df.itertuples(index=False):
+        print(f"Input check {issue.Severity} in {issue.Source} ({issue.Check}): {issue.Detail}")
+
+    errors = issues_df[issues_df["Severity"] == "error"]
+    if len(errors):
+        failed = ', '.join(dict.fromkeys(errors["Source"]))
+        raise ValueError(f"{len(errors)} input check(s) failed in: {failed}")
+    return issues_df
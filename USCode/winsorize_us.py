@@ -0,0 +1,31 @@
+import warnings
+import pandas as pd
+import numpy as np
+
+
+def cross_section_bounds(values, limits=(0.01, 0.99)):
+    """Lower and upper percentile of every row of a dates x stocks array, NaN-aware."""
+    with warnings.catch_warnings():
+        # Dates without any observation simply get NaN bounds
+        warnings.simplefilter('ignore', RuntimeWarning)
+        bounds = np.nanquantile(values, limits, axis=1)
+    return bounds[0], bounds[1]
+
+
+def winsorize_cross_section(panel_df, limits=(0.01, 0.99), trim=False):
+    """Clip (or with trim=True blank out) each date's cross-section outside the given percentiles.
+
+    The per-date bounds come from one NaN-aware row-wise quantile call over the whole wide panel.
+    """
+    if limits is None:
+        return panel_df
+    values = panel_df.to_numpy(dtype=float)
+    lower, upper = cross_section_bounds(values, limits)
+    lower, upper = lower[:, None], upper[:, None]
+
+    if trim:
+        outside = (values < lower) | (values > upper)
+        values = np.where(outside, np.nan, values)
+    else:
+        values = np.clip(values, lower, upper)
+    return pd.DataFrame(values, index=panel_df.index, columns=panel_df.columns)